@@ -0,0 +1,265 @@
+"""
+Async HTTP API around the quiz pipeline, for frontends other than the Streamlit app.
+
+Run from the repository root:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Set QUIZGEN_STUB_LLM=1 to answer every LLM call with utils.llm_stub instead of
+Groq, e.g. for local testing without an API key.
+"""
+import asyncio
+import io
+import os
+import time
+from typing import List, Optional
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, Header, HTTPException, UploadFile
+from pydantic import BaseModel, Field
+from utils.extract_text import extract_text_cached, extraction_cache_stats
+from utils.quiz_generator import (astream_quiz, agenerate_quiz, extract_topics, agenerate_explanations,
+                                  agenerate_mixed_quiz, generate_mixed_quiz, generate_quiz_structured, mixed_sections,
+                                  top_up_questions, plan_quiz_request, quiz_cache_stats, QUIZ_MODEL)
+from utils.quiz_parser import QUIZ_TYPES, MIXED, format_quiz, parse_quiz
+from utils.tokens import MODEL_CONTEXT, estimate_tokens
+from utils.llm import client_stats, set_chat_model_factory
+from utils.rate_limit import MODEL_LIMITS, limiter_stats, set_limits
+from utils.router import AUTO, route, router_stats
+from utils.db import get_pool, init_db
+
+load_dotenv()
+init_db()
+
+STUB_LLM = os.getenv("QUIZGEN_STUB_LLM") == "1"
+if STUB_LLM:
+    from utils.llm_stub import stub_chat_model
+    set_chat_model_factory(stub_chat_model)
+    # The stub has no provider limits to respect; don't let them cap a load test
+    for model in list(MODEL_LIMITS):
+        set_limits(model, 1_000_000, 1_000_000_000)
+
+# LLM requests in flight at once across all API requests, and extractions (CPU bound)
+MAX_CONCURRENT_LLM = int(os.getenv("QUIZGEN_MAX_CONCURRENT_LLM", "16"))
+MAX_CONCURRENT_EXTRACT = int(os.getenv("QUIZGEN_MAX_CONCURRENT_EXTRACT", str(os.cpu_count() or 1)))
+# Seconds a request may wait for a free slot before it is turned away with 503
+QUEUE_TIMEOUT = float(os.getenv("QUIZGEN_QUEUE_TIMEOUT", "30"))
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+FILE_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+}
+
+app = FastAPI(title="QuizGen API")
+
+_slots = {}
+_metrics = {}
+_started = time.time()
+
+
+@app.on_event("startup")
+async def create_slots():
+    # Created on the server's event loop; older Pythons bind a semaphore to the loop current at creation
+    _slots["llm"] = asyncio.Semaphore(MAX_CONCURRENT_LLM)
+    _slots["extract"] = asyncio.Semaphore(MAX_CONCURRENT_EXTRACT)
+
+
+class TopicsRequest(BaseModel):
+    text: str
+
+
+class GenerateRequest(BaseModel):
+    text: str
+    quiz_type: str = "MCQ"
+    num_questions: int = Field(5, ge=1, le=50)
+    with_explanations: bool = False
+    fresh: bool = False
+    structured: bool = False
+    model: str = QUIZ_MODEL
+
+
+class QuestionIn(BaseModel):
+    question: str
+    options: dict = {}
+    correct: str
+    explanation: Optional[str] = None
+
+
+class ExplainRequest(BaseModel):
+    questions: List[QuestionIn]
+
+
+class _Slot:
+    """Holds one slot of a semaphore for an endpoint, recording its metrics."""
+
+    def __init__(self, kind, endpoint):
+        self.semaphore = _slots[kind]
+        self.metrics = _metrics.setdefault(endpoint, {"requests": 0, "errors": 0, "rejected": 0,
+                                                      "in_flight": 0, "total_seconds": 0.0})
+
+    async def __aenter__(self):
+        self.metrics["requests"] += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.metrics["rejected"] += 1
+            raise HTTPException(503, "Server busy, try again later")
+        self.metrics["in_flight"] += 1
+        self.started = time.perf_counter()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+        self.metrics["in_flight"] -= 1
+        self.metrics["total_seconds"] += time.perf_counter() - self.started
+        # Cancellation (e.g. the client disconnected) is not an error and must propagate as is
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.metrics["errors"] += 1
+            if not issubclass(exc_type, HTTPException):
+                raise HTTPException(502, str(exc))
+
+
+def _api_key(header_key):
+    api_key = header_key or os.getenv("GROQ_API_KEY") or ("stub" if STUB_LLM else None)
+    if not api_key:
+        raise HTTPException(401, "Missing Groq API key (X-Groq-Api-Key header or GROQ_API_KEY)")
+    return api_key
+
+
+@app.post("/extract")
+async def extract(file: UploadFile = File(...)):
+    extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in FILE_TYPES:
+        raise HTTPException(415, "Only PDF, DOCX and TXT files are supported")
+    data = await file.read()
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, "File too large")
+    async with _Slot("extract", "extract"):
+        try:
+            text = await asyncio.to_thread(extract_text_cached, io.BytesIO(data), FILE_TYPES[extension])
+        except Exception as e:
+            raise HTTPException(422, str(e))
+    return {"text": text, "tokens": estimate_tokens(text)}
+
+
+@app.post("/topics")
+async def topics(request: TopicsRequest, x_groq_api_key: Optional[str] = Header(None)):
+    api_key = _api_key(x_groq_api_key)
+    async with _Slot("llm", "topics"):
+        # Topic extraction is cached in SQLite and rarely reaches the model
+        result = await asyncio.to_thread(extract_topics, request.text, api_key)
+    return {"topics": result}
+
+
+@app.post("/generate")
+async def generate(request: GenerateRequest, x_groq_api_key: Optional[str] = Header(None)):
+    if request.quiz_type not in QUIZ_TYPES + (MIXED,):
+        raise HTTPException(422, f"quiz_type must be one of {', '.join(QUIZ_TYPES + (MIXED,))}")
+    if request.model != AUTO and request.model not in MODEL_CONTEXT:
+        raise HTTPException(422, f"model must be one of {', '.join(list(MODEL_CONTEXT) + [AUTO])}")
+    api_key = _api_key(x_groq_api_key)
+    # 'auto' picks a model by quiz size and recent model health
+    model = route(request.model, request.num_questions)
+    if request.quiz_type == MIXED:
+        return await _generate_mixed(request, api_key, model)
+    plan = plan_quiz_request(request.text, request.quiz_type, request.num_questions,
+                             request.with_explanations, model)
+    async with _Slot("llm", "generate"):
+        if request.structured:
+            # JSON output validated per question; bad or missing ones are re-requested
+            questions, diagnostics = await asyncio.to_thread(
+                generate_quiz_structured, request.text, request.quiz_type, request.num_questions, api_key,
+                request.with_explanations, request.fresh, model_name=plan.model)
+            return _quiz_response(format_quiz(questions), questions, diagnostics, plan)
+        if plan.action == "chunk":
+            # Fits no model's context: map-reduce over sections, as the app and batch mode do
+            quiz = await agenerate_quiz(request.text, request.quiz_type, request.num_questions, api_key,
+                                        request.with_explanations, request.fresh, plan.model)
+        else:
+            chunks = []
+            async for chunk in astream_quiz(request.text, request.quiz_type, request.num_questions, api_key,
+                                            request.with_explanations, plan.model, fresh=request.fresh):
+                chunks.append(chunk)
+            quiz = "".join(chunks)
+        questions, diagnostics = parse_quiz(quiz, request.quiz_type)
+        if len(questions) < request.num_questions:
+            # Only the missing questions are re-requested
+            questions, follow_up = await asyncio.to_thread(
+                top_up_questions, questions, request.text, request.quiz_type, request.num_questions, api_key,
+                request.with_explanations, model_name=plan.model)
+            diagnostics += follow_up
+            quiz = format_quiz(questions)
+    return _quiz_response(quiz, questions, diagnostics, plan)
+
+
+def _quiz_response(quiz, questions, diagnostics, plan):
+    return {
+        "quiz": quiz,
+        "questions": [q.to_dict() for q in questions],
+        "diagnostics": [d.message for d in diagnostics],
+        "model": plan.model,
+        "estimated_input_tokens": plan.input_tokens,
+        "estimated_output_tokens": plan.output_tokens,
+    }
+
+
+async def _generate_mixed(request, api_key, model):
+    sections = mixed_sections(request.num_questions)
+    async with _Slot("llm", "generate"):
+        if request.structured:
+            questions, diagnostics = await asyncio.to_thread(
+                generate_mixed_quiz, request.text, sections, api_key, request.with_explanations, request.fresh,
+                model, structured=True)
+        else:
+            # Every quiz type is generated concurrently on this event loop
+            questions, diagnostics = await agenerate_mixed_quiz(
+                request.text, sections, api_key, request.with_explanations, request.fresh, model)
+    return {
+        "quiz": format_quiz(questions),
+        "questions": [q.to_dict() for q in questions],
+        "diagnostics": [d.message for d in diagnostics],
+        "model": model,
+    }
+
+
+@app.post("/explain")
+async def explain(request: ExplainRequest, x_groq_api_key: Optional[str] = Header(None)):
+    quiz_data = [q.dict(exclude_none=True) for q in request.questions]
+    for q in quiz_data:
+        if q["options"] and sorted(q["options"]) != ["a", "b", "c", "d"]:
+            raise HTTPException(422, "MCQ options must be a-d")
+    api_key = _api_key(x_groq_api_key)
+    async with _Slot("llm", "explain"):
+        explanations = await agenerate_explanations(quiz_data, api_key)
+    return {"explanations": {str(i): text for i, text in explanations.items()}}
+
+
+@app.get("/health")
+async def health():
+    try:
+        await asyncio.to_thread(_ping_db)
+    except Exception as e:
+        raise HTTPException(503, f"Database unavailable: {e}")
+    return {"status": "ok", "uptime_seconds": round(time.time() - _started, 1)}
+
+
+def _ping_db():
+    with get_pool().connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+
+
+@app.get("/metrics")
+async def metrics():
+    endpoints = {}
+    for endpoint, values in _metrics.items():
+        served = values["requests"] - values["rejected"] - values["in_flight"]
+        endpoints[endpoint] = dict(values, avg_seconds=round(values["total_seconds"] / served, 3) if served else 0.0)
+    return {
+        "endpoints": endpoints,
+        "limits": {"llm": MAX_CONCURRENT_LLM, "extract": MAX_CONCURRENT_EXTRACT, "queue_timeout": QUEUE_TIMEOUT},
+        "llm_clients": client_stats(),
+        "rate_limits": limiter_stats(),
+        "models": router_stats(),
+        "quiz_cache": await asyncio.to_thread(quiz_cache_stats),
+        "extraction_cache": extraction_cache_stats(),
+        "db_pool": get_pool().stats(),
+    }
@@ -1,103 +1,81 @@
 import streamlit as st
-from utils.extract_text import extract_text
-from utils.quiz_generator import generate_quiz
+from utils.extract_text import extract_text_cached
+from utils.quiz_generator import merge_question_blocks
+from utils.quiz_parser import QUIZ_TYPES, MIXED, OPTION_LETTERS, Diagnostic, parse_quiz, is_correct, format_answer
+from utils.tokens import MODELS, estimate_tokens
+from utils.retrieval import select_passages
+from utils.cache import content_hash
+from utils.question_bank import fill_bank_async, sample_questions, count_unseen
+from utils.jobs import init_jobs, submit_job, get_job, wait_for_job
+from utils.db import init_db, register_user, authenticate_user, save_score, get_leaderboard
 from dotenv import load_dotenv
 import os
 import pandas as pd
-import re
-import json
-import sqlite3
-import hashlib
 import time
 
-# Correctly import missing LangChain and Groq modules
-from langchain_groq import ChatGroq
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 # Initialize SQLite database
-def init_db():
-    conn = sqlite3.connect('quizgen.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT NOT NULL
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS scores (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        score INTEGER,
-        total_questions INTEGER,
-        quiz_date TEXT,
-        FOREIGN KEY (username) REFERENCES users (username)
-    )''')
-    conn.commit()
-    conn.close()
-
 init_db()
 
-# Hash password
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# Register user
-def register_user(username, password):
-    conn = sqlite3.connect('quizgen.db')
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", 
-                 (username, hash_password(password)))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-# Authenticate user
-def authenticate_user(username, password):
-    conn = sqlite3.connect('quizgen.db')
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
-    if result and result[0] == hash_password(password):
-        return True
-    return False
-
-# Save score
-def save_score(username, score, total_questions):
-    conn = sqlite3.connect('quizgen.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO scores (username, score, total_questions, quiz_date) VALUES (?, ?, ?, datetime('now'))",
-             (username, score, total_questions))
-    conn.commit()
-    conn.close()
-
-# Get leaderboard data
-def get_leaderboard():
-    conn = sqlite3.connect('quizgen.db')
-    c = conn.cursor()
-    c.execute("""
-        SELECT 
-            username, 
-            MAX(score * 100.0 / total_questions) as percentage, 
-            MAX(score) as score,
-            MAX(total_questions) as total_questions,
-            MAX(quiz_date) as quiz_date,
-            COUNT(*) as attempts
-        FROM scores
-        GROUP BY username
-        ORDER BY percentage DESC
-        LIMIT 10
-    """)
-    results = c.fetchall()
-    conn.close()
-    return results
+
+@st.cache_resource
+def start_job_workers():
+    # Once per server process, not on every rerun: requeueing "stale" jobs on every
+    # click would hand long-running jobs to a second worker
+    init_jobs()
+
+
+# Resume background jobs left queued by a previous server process
+start_job_workers()
+
+
+def job_result(job_id, label, preview=False):
+    """
+    Polls a background job, showing its progress, and returns its result.
+
+    With preview, questions the job reports while it runs are shown as they arrive.
+    """
+    progress = st.progress(0.0, text=label)
+    preview_area = st.empty() if preview else None
+    shown = [0]
+
+    def on_progress(job):
+        progress.progress(min(job["progress"], 1.0), text=job["message"] or label)
+        questions = job["preview"] or []
+        # Redrawn only when the count changes, e.g. shrinks when the job switches models
+        if preview_area is not None and len(questions) != shown[0]:
+            shown[0] = len(questions)
+            with preview_area.container():
+                for n, question in enumerate(questions, 1):
+                    st.markdown(f"**Q{n}.** {question['question']}")
+
+    job = wait_for_job(job_id, on_progress=on_progress)
+    progress.empty()
+    if job is None:
+        raise Exception("The job no longer exists")
+    if job["status"] == "failed":
+        raise Exception(job["error"])
+    return job["result"]
+
+
+def start_quiz(quiz, quiz_type, num_questions, quiz_data):
+    """Stores a generated quiz in the session and resets the interactive quiz."""
+    st.session_state.quiz = quiz
+    st.session_state.quiz_type = quiz_type
+    st.session_state.num_questions = num_questions
+    st.session_state.quiz_data = quiz_data
+    st.session_state.current_question = 0
+    st.session_state.user_answers = {}
+    st.session_state.score = 0
+    st.session_state.show_results = False
+    st.session_state.explanations = {}
+    # Answer widgets of the previous quiz must not carry over to this one
+    for key in [key for key in st.session_state if str(key).startswith("question_")]:
+        del st.session_state[key]
+
 
 # Page configuration
 st.set_page_config(
@@ -570,6 +548,7 @@ else:
         st.session_state.show_results = False
         st.session_state.quiz_topics = []
         st.session_state.explanations = {}
+        st.query_params.pop("job", None)
         st.rerun()
 
     # Navigation tabs
@@ -664,32 +643,22 @@ else:
             
             if uploaded_file:
                 try:
-                    text = extract_text(uploaded_file, uploaded_file.type)
+                    text = extract_text_cached(uploaded_file, uploaded_file.type)
                     st.success(f"✅ Successfully extracted text from {uploaded_file.name}")
                     
-                    # Extract topics from text
-                    with st.spinner("🔍 Identifying topics..."):
-                        model = ChatGroq(
-                            temperature=0.5,
-                            groq_api_key=GROQ_API_KEY,
-                            model_name="llama3-70b-8192"
-                        )
-                        prompt = PromptTemplate.from_template("""
-                        Analyze the following syllabus content and extract 5-7 main topics suitable for quiz generation.
-                        Return ONLY a JSON array of topic names without any additional text.
-                        
-                        Syllabus Content:
-                        {text}
-                        """)
-                        chain = prompt | model | StrOutputParser()
-                        topics_json = chain.invoke({"text": text})
-                        
-                        try:
-                            st.session_state.quiz_topics = json.loads(topics_json)
-                        except:
-                            st.session_state.quiz_topics = []
                 except Exception as e:
                     st.error(f"Error extracting text: {str(e)}")
+
+            # Extract topics from text (a background job, reused on every rerun once done).
+            # A failed extraction is not retried on every rerun of the same session.
+            if text and st.session_state.get("topics_failed_for") != content_hash(text):
+                try:
+                    topics_job = submit_job("topics", {"text": text}, api_key=GROQ_API_KEY)
+                    st.session_state.quiz_topics = job_result(topics_job, "🔍 Identifying topics...")
+                except Exception as e:
+                    st.session_state.topics_failed_for = content_hash(text)
+                    st.session_state.quiz_topics = []
+                    st.warning(f"Topics are unavailable, the quiz will cover the whole syllabus: {str(e)}")
                     
         elif input_method == "Text Paste":
             text = st.text_area("Paste Syllabus Content:", 
@@ -707,7 +676,7 @@ else:
         col1, col2, col3 = st.columns([1, 1, 1.5])
         with col1:
             st.markdown('<div style="margin-bottom: 10px; font-weight: 500; color: #00ccff;">Quiz Type</div>', unsafe_allow_html=True)
-            quiz_type = st.selectbox("Quiz Type", ["MCQ", "True/False", "Fill-in-the-Blank"], label_visibility="collapsed")
+            quiz_type = st.selectbox("Quiz Type", list(QUIZ_TYPES) + [MIXED], label_visibility="collapsed")
             
         with col2:
             st.markdown('<div style="margin-bottom: 10px; font-weight: 500; color: #00ccff;">Number of Questions</div>', unsafe_allow_html=True)
@@ -717,11 +686,18 @@ else:
             st.markdown('<div class="model-selector">', unsafe_allow_html=True)
             st.markdown('<div style="margin-bottom: 10px; font-weight: 500; color: #00ccff;">AI Model Selection</div>', unsafe_allow_html=True)
             model_choice = st.radio("AI Model", 
-                                    ["Llama 3 70B (Recommended)", "Mixtral 8x7B", "Llama 3 8B"],
+                                    list(MODELS),
                                     label_visibility="collapsed")
+            inline_explanations = st.checkbox("💡 Generate explanations with the quiz (instant results on submit)",
+                                              value=True)
+            fresh_quiz = st.checkbox("🔄 Fresh quiz (don't reuse a previously generated one)", value=False)
+            structured_output = st.checkbox("🧩 Validated JSON output (fewer malformed questions, no live preview)",
+                                            value=False)
             st.markdown('</div>', unsafe_allow_html=True)
 
         # Topic selection
+        selected_topics = []
+        syllabus_hash = content_hash(text) if text.strip() else None
         if st.session_state.quiz_topics:
             st.markdown("""
             <div class="card">
@@ -729,27 +705,42 @@ else:
                 <div class="topic-selector">
             """, unsafe_allow_html=True)
             
-            selected_topics = []
             for topic in st.session_state.quiz_topics:
                 if st.checkbox(topic, value=True, key=f"topic_{topic}"):
                     selected_topics.append(topic)
             
             st.markdown("</div></div>", unsafe_allow_html=True)
+
+            # Keep the question bank for this syllabus topped up in the background (banks hold one quiz type)
+            if selected_topics and syllabus_hash and quiz_type != MIXED:
+                fill_bank_async(text, syllabus_hash, selected_topics, quiz_type,
+                                st.session_state.username, GROQ_API_KEY)
+                banked = count_unseen(syllabus_hash, quiz_type, selected_topics, st.session_state.username)
+                st.caption(f"⚡ {banked} pre-generated questions ready for the selected topics")
             
-            # Add selected topics to context
+            # Send only the passages relevant to the selected topics; the job adds the topics
+            # themselves, so a fanned-out quiz can give each request its own share of them
             if selected_topics:
-                text += f"\n\nFocus on these topics: {', '.join(selected_topics)}"
-
-        # Model mapping
-        MODELS = {
-            "Llama 3 70B (Recommended)": "llama3-70b-8192",
-            "Mixtral 8x7B": "mixtral-8x7b-32768",
-            "Llama 3 8B": "llama3-8b-8192"
-        }
+                full_tokens = estimate_tokens(text)
+                text = select_passages(text, selected_topics)
+                if estimate_tokens(text) < full_tokens:
+                    st.caption(f"🔎 Using the most relevant passages: ~{estimate_tokens(text)} of {full_tokens} tokens")
 
         # Generate quiz button
         st.markdown("</div>", unsafe_allow_html=True) # Close card
 
+        # A quiz whose job id is in the URL survives refreshes and reconnects: pick up its result
+        restored_job = st.query_params.get("job")
+        if restored_job and st.session_state.get("loaded_job") != restored_job:
+            st.session_state.loaded_job = restored_job
+            job = get_job(restored_job)
+            if job and job["kind"] == "generate":
+                try:
+                    result = job_result(restored_job, "⏳ Resuming quiz generation...", preview=True)
+                    start_quiz(result["quiz"], result["quiz_type"], result["num_questions"], result["questions"])
+                except Exception as e:
+                    st.error(f"Error generating quiz: {str(e)}")
+
         if st.button("✨ Generate Quiz", use_container_width=True, type="primary", key="generate_quiz"):
             if not text.strip():
                 st.warning("Please provide syllabus content")
@@ -758,44 +749,53 @@ else:
             selected_model = MODELS[model_choice]
             with st.spinner(f"🧠 Generating {num_questions} {quiz_type} questions using {model_choice}..."):
                 try:
-                    quiz = generate_quiz(text, quiz_type, num_questions, GROQ_API_KEY)
-                    st.session_state.quiz = quiz
-                    st.session_state.quiz_type = quiz_type
-                    st.session_state.num_questions = num_questions
+                    bank_blocks = []
+                    if selected_topics and syllabus_hash and not fresh_quiz and quiz_type != MIXED:
+                        bank_blocks = sample_questions(syllabus_hash, quiz_type, selected_topics,
+                                                       num_questions, st.session_state.username)
+                    if bank_blocks:
+                        # Served instantly from the pre-generated question bank
+                        quiz = merge_question_blocks(bank_blocks)
+                        questions, diagnostics = parse_quiz(quiz, quiz_type)
+                        quiz_data = [question.to_dict() for question in questions]
+                    else:
+                        # Generated by a background job; its id goes in the URL so a refreshed page
+                        # picks up the result instead of paying for the generation again
+                        job_id = submit_job("generate", {
+                            "text": text,
+                            "quiz_type": quiz_type,
+                            "num_questions": num_questions,
+                            "with_explanations": inline_explanations,
+                            "fresh": fresh_quiz,
+                            "structured": structured_output,
+                            "topics": selected_topics,
+                            "model": selected_model,
+                        }, api_key=GROQ_API_KEY, dedupe=not fresh_quiz)
+                        st.query_params["job"] = job_id
+                        st.session_state.loaded_job = job_id
+                        result = job_result(job_id, "Waiting for the first question...", preview=True)
+                        st.caption(f"📏 {result['plan']}")
+                        quiz = result["quiz"]
+                        quiz_data = result["questions"]
+                        diagnostics = [Diagnostic(*diagnostic) for diagnostic in result["diagnostics"]]
+
                     st.session_state.model_choice = model_choice
-                    
                     # Parse quiz for interactive session
-                    if quiz_type == "MCQ":
-                        pattern = r"Q(\d+)\.\s*(.*?)\s*a\)\s*(.*?)\s*b\)\s*(.*?)\s*c\)\s*(.*?)\s*d\)\s*(.*?)\s*Answer:\s*(\w)"
-                        matches = re.findall(pattern, quiz, re.DOTALL)
-                        
-                        quiz_data = []
-                        for match in matches:
-                            quiz_data.append({
-                                "question": match[1].strip(),
-                                "options": {
-                                    "a": match[2].strip(),
-                                    "b": match[3].strip(),
-                                    "c": match[4].strip(),
-                                    "d": match[5].strip()
-                                },
-                                "correct": match[6].strip().lower()
-                            })
-                        st.session_state.quiz_data = quiz_data
-                        st.session_state.current_question = 0
-                        st.session_state.user_answers = {}
-                        st.session_state.score = 0
-                        st.session_state.show_results = False
-                        st.session_state.explanations = {}
+                    start_quiz(quiz, quiz_type, num_questions, quiz_data)
                 
                     st.success("✅ Quiz generated successfully!")
+                    if diagnostics:
+                        st.warning(f"⚠️ {len(diagnostics)} question(s) in the model output were malformed and had to be regenerated")
+                        with st.expander("Parser details"):
+                            for diagnostic in diagnostics:
+                                st.write(f"Line {diagnostic.line}: {diagnostic.message}")
                 except Exception as e:
                     st.error(f"Error generating quiz: {str(e)}")
                     st.write("💡 If you see model errors, try switching to a different AI model")
                     st.stop()
 
         # Interactive Quiz Interface
-        if st.session_state.quiz_data and st.session_state.quiz_type == "MCQ" and not st.session_state.show_results:
+        if st.session_state.quiz_data and not st.session_state.show_results:
             st.markdown("""
             <div class="card">
                 <div class="card-title">📝 Interactive Quiz</div>
@@ -820,33 +820,35 @@ else:
                 question_data = st.session_state.quiz_data[st.session_state.current_question]
                 st.markdown(f'<div class="question-text">Q{st.session_state.current_question + 1}. {question_data["question"]}</div>', unsafe_allow_html=True)
                 
-                # Options - FIXED: Now updates selection correctly
+                # Answer input for the question's type (a mixed quiz has all three)
                 key = f"question_{st.session_state.current_question}"
-                if key in st.session_state:
-                    default_index = ord(st.session_state.user_answers.get(st.session_state.current_question, ' ')) - ord('a') 
-                    if default_index < 0 or default_index > 3:
-                        default_index = None
+                question_type = question_data.get("type", st.session_state.quiz_type)
+                saved_answer = st.session_state.user_answers.get(st.session_state.current_question)
+                if question_type == "Fill-in-the-Blank":
+                    user_answer = st.text_input("Fill in the blank:", value=saved_answer or "", key=key)
+                    if user_answer.strip():
+                        st.session_state.user_answers[st.session_state.current_question] = user_answer.strip()
+                    else:
+                        st.session_state.user_answers.pop(st.session_state.current_question, None)
                 else:
-                    default_index = None
-                    
-                options = [
-                    f"a) {question_data['options']['a']}",
-                    f"b) {question_data['options']['b']}",
-                    f"c) {question_data['options']['c']}",
-                    f"d) {question_data['options']['d']}"
-                ]
-                
-                user_answer = st.radio(
-                    "Select your answer:",
-                    options=options,
-                    index=default_index,
-                    key=key
-                )
-                
-                # Always update answer when selection changes
-                if user_answer:
-                    answer_char = user_answer[0].lower()
-                    st.session_state.user_answers[st.session_state.current_question] = answer_char
+                    # Option label -> stored answer ('a'-'d', or 'true'/'false')
+                    if question_type == "True/False":
+                        choices = {"True": "true", "False": "false"}
+                    else:
+                        choices = {f"{letter}) {question_data['options'][letter]}": letter for letter in OPTION_LETTERS}
+                    answers = list(choices.values())
+                    default_index = answers.index(saved_answer) if key in st.session_state and saved_answer in answers else None
+
+                    user_answer = st.radio(
+                        "Select your answer:",
+                        options=list(choices),
+                        index=default_index,
+                        key=key
+                    )
+
+                    # Always update answer when selection changes
+                    if user_answer:
+                        st.session_state.user_answers[st.session_state.current_question] = choices[user_answer]
                 
                 # Navigation buttons
                 col1, col2, col3 = st.columns([1,1,2])
@@ -863,41 +865,22 @@ else:
                             st.rerun()
                     else:
                         if st.button("✅ Submit Quiz", type="primary", use_container_width=True):
-                            # Calculate score and generate explanations
+                            # Calculate score
                             score = 0
-                            # Use faster model for explanations to improve response time
-                            model = ChatGroq(
-                                temperature=0.7,
-                                groq_api_key=GROQ_API_KEY,
-                                model_name="llama3-8b-8192"  # Faster model
-                            )
-                            prompt = PromptTemplate.from_template("""
-                            Explain why the correct answer is {correct} for this question:
-                            Question: {question}
-                            Options:
-                            a) {a}
-                            b) {b}
-                            c) {c}
-                            d) {d}
-                            
-                            Provide a concise 1-2 sentence explanation.
-                            """)
-                            chain = prompt | model | StrOutputParser()
-                            
-                            with st.spinner("🧠 Generating explanations..."):
-                                for i, q in enumerate(st.session_state.quiz_data):
-                                    if i in st.session_state.user_answers and st.session_state.user_answers[i] == q["correct"]:
-                                        score += 1
-                                    # Generate explanation
-                                    explanation = chain.invoke({
-                                        "correct": q["correct"],
-                                        "question": q["question"],
-                                        "a": q["options"]["a"],
-                                        "b": q["options"]["b"],
-                                        "c": q["options"]["c"],
-                                        "d": q["options"]["d"]
-                                    })
-                                    st.session_state.explanations[i] = explanation
+                            for i, q in enumerate(st.session_state.quiz_data):
+                                if is_correct(q, st.session_state.user_answers.get(i)):
+                                    score += 1
+
+                            # Inline explanations are reused; any missing ones are generated concurrently
+                            # in a background job, deduplicated if the same quiz is submitted again
+                            try:
+                                explain_job = submit_job("explain", {"quiz_data": st.session_state.quiz_data},
+                                                         api_key=GROQ_API_KEY)
+                                explanations = job_result(explain_job, "🧠 Generating explanations...")
+                                st.session_state.explanations = {int(i): e for i, e in explanations.items()}
+                            except Exception as e:
+                                st.warning(f"Explanations are unavailable: {str(e)}")
+                                st.session_state.explanations = {}
                             
                             st.session_state.score = score
                             save_score(st.session_state.username, score, len(st.session_state.quiz_data))
@@ -938,18 +921,18 @@ else:
             for i, question in enumerate(st.session_state.quiz_data):
                 user_answer = st.session_state.user_answers.get(i, None)
                 correct_answer = question['correct']
-                is_correct = user_answer == correct_answer
+                answered_correctly = is_correct(question, user_answer)
                 
                 feedback_html = (
                     f'<div class="feedback-correct">✓ Correct! Well done.</div>'
-                    if is_correct else
-                    f'<div class="feedback-incorrect">✗ Incorrect. The correct answer is <strong>{correct_answer.upper()}) {question['options'][correct_answer]}</strong></div>'
+                    if answered_correctly else
+                    f'<div class="feedback-incorrect">✗ Incorrect. The correct answer is <strong>{format_answer(question, correct_answer)}</strong></div>'
                 )
                 
                 st.markdown(f"""
                 <div class="result-item">
                     <h4>Q{i+1}. {question['question']}</h4>
-                    <p>Your answer: {user_answer.upper() if user_answer else 'Not answered'}) {question['options'][user_answer] if user_answer else ''}</p>
+                    <p>Your answer: {format_answer(question, user_answer)}</p>
                     {feedback_html}
                     <div class="explanation">💡 {st.session_state.explanations.get(i, 'No explanation available.')}</div>
                 </div>
@@ -1004,18 +987,20 @@ else:
                 )
             
             with col2:
-                if st.session_state.quiz_type == "MCQ":
+                if st.session_state.quiz_data:
                     try:
-                        df = pd.DataFrame(st.session_state.quiz_data)
-                        # Reformat the dataframe for a clean CSV
-                        df_export = pd.DataFrame({
-                            "Question": df["question"],
-                            "Option A": df["options"].apply(lambda x: x.get("a")),
-                            "Option B": df["options"].apply(lambda x: x.get("b")),
-                            "Option C": df["options"].apply(lambda x: x.get("c")),
-                            "Option D": df["options"].apply(lambda x: x.get("d")),
-                            "Correct Answer": df["correct"]
-                        })
+                        # One row per question; option columns only when the quiz has MCQs
+                        has_options = any(q["options"] for q in st.session_state.quiz_data)
+                        rows = []
+                        for q in st.session_state.quiz_data:
+                            row = {"Type": q["type"]} if st.session_state.quiz_type == MIXED else {}
+                            row["Question"] = q["question"]
+                            if has_options:
+                                for letter in OPTION_LETTERS:
+                                    row[f"Option {letter.upper()}"] = q["options"].get(letter, "")
+                            row["Correct Answer"] = q["correct"] if q["options"] else format_answer(q, q["correct"])
+                            rows.append(row)
+                        df_export = pd.DataFrame(rows)
                         csv = df_export.to_csv(index=False).encode('utf-8')
                         
                         st.download_button(
@@ -1038,7 +1023,10 @@ else:
         </div>
         """, unsafe_allow_html=True)
         
-        leaderboard_data = get_leaderboard()
+        window_labels = {"All Time": "all", "This Week": "week", "Today": "day"}
+        window_choice = st.radio("Leaderboard window", list(window_labels),
+                                 horizontal=True, label_visibility="collapsed")
+        leaderboard_data = get_leaderboard(window_labels[window_choice])
         if leaderboard_data:
             st.markdown('<div class="leaderboard-container">', unsafe_allow_html=True)
             st.markdown('<div class="leaderboard-title animate__animated animate__fadeIn">Leaderboard</div>', unsafe_allow_html=True)
@@ -0,0 +1,200 @@
+"""
+Headless batch mode: generates a quiz for every syllabus in a directory.
+
+Run from the repository root:
+    python batch_generate.py syllabi/ --out quizzes/ --type MCQ --questions 10 --workers 4 --rpm 30 --tpm 6000
+
+Each syllabus gets <name>.json and <name>.csv in the output directory, mirroring
+the input tree. Syllabi whose outputs are newer than the source are skipped,
+so an interrupted run picks up where it stopped. A throughput summary is
+printed and written to _summary.json.
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from dotenv import load_dotenv
+from utils import rate_limit
+from utils.router import AUTO, route
+from utils.extract_text import extract_text
+from utils.quiz_generator import generate_quiz, generate_quiz_structured, top_up_questions, QUIZ_MODEL
+from utils.quiz_parser import QUIZ_TYPES, OPTION_LETTERS, parse_quiz
+from utils.tokens import MODEL_CONTEXT
+
+# Syllabus file extensions and the MIME types extract_text expects
+FILE_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".txt": "text/plain",
+}
+
+
+def find_syllabi(input_dir):
+    """Returns every supported syllabus file under input_dir, sorted by path."""
+    return sorted(path for path in Path(input_dir).rglob("*")
+                  if path.is_file() and path.suffix.lower() in FILE_TYPES)
+
+
+def output_paths(path, input_dir, out_dir):
+    """Returns the (json, csv) output paths of a syllabus, mirroring the input tree."""
+    base = Path(out_dir) / path.relative_to(input_dir).with_suffix("")
+    return base.with_name(base.name + ".json"), base.with_name(base.name + ".csv")
+
+
+def is_done(path, json_path):
+    """A syllabus is done once its JSON output exists and is newer than the source."""
+    return json_path.exists() and json_path.stat().st_mtime >= path.stat().st_mtime
+
+
+def write_atomic(path, write):
+    # Written to a temporary file first, so an interrupted run never leaves a
+    # half-written output that would be mistaken for a finished one
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_csv(f, questions):
+    writer = csv.writer(f)
+    writer.writerow(["number", "type", "question", *OPTION_LETTERS, "answer", "explanation"])
+    for q in questions:
+        writer.writerow([q.number, q.quiz_type, q.question, *(q.options.get(letter, "") for letter in OPTION_LETTERS),
+                         q.answer, q.explanation])
+
+
+def process_syllabus(path, args, api_key):
+    """
+    Extracts one syllabus, generates its quiz and writes the outputs.
+
+    Returns:
+        dict: Per-file result for the summary
+    """
+    json_path, csv_path = output_paths(path, args.input_dir, args.out)
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        text = extract_text(f, FILE_TYPES[path.suffix.lower()])
+
+    # In auto mode each syllabus goes to whichever model is currently healthiest
+    model = route(args.model, args.questions)
+    # Every LLM call waits for the shared per-model limits and retries 429s with backoff
+    with rate_limit.priority(rate_limit.BULK):
+        if args.structured:
+            # JSON output validated per question, topped up internally
+            questions, diagnostics = generate_quiz_structured(text, args.type, args.questions, api_key,
+                                                              args.explanations, args.fresh, model_name=model)
+        else:
+            quiz = generate_quiz(text, args.type, args.questions, api_key, with_explanations=args.explanations,
+                                 fresh=args.fresh, model_name=model, fanout=args.fanout)
+            questions, diagnostics = parse_quiz(quiz, args.type)
+        if len(questions) < args.questions:
+            # Only the missing questions are re-requested
+            questions, follow_up = top_up_questions(questions, text, args.type, args.questions, api_key,
+                                                    with_explanations=args.explanations, model_name=model)
+            diagnostics += follow_up
+
+    record = {
+        "source": str(path.relative_to(args.input_dir)),
+        "quiz_type": args.type,
+        "model": model,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "questions": [q.to_dict() for q in questions],
+        "diagnostics": [d.message for d in diagnostics],
+    }
+    write_atomic(csv_path, lambda f: write_csv(f, questions))
+    # The JSON is written last: its presence marks the syllabus as done
+    write_atomic(json_path, lambda f: json.dump(record, f, indent=2, ensure_ascii=False))
+    return {"source": record["source"], "questions": len(questions), "seconds": time.perf_counter() - started}
+
+
+def summarize(results, failures, skipped, elapsed):
+    seconds = [r["seconds"] for r in results]
+    total_questions = sum(r["questions"] for r in results)
+    minutes = elapsed / 60 if elapsed else 0
+    return {
+        "generated": len(results),
+        "skipped": skipped,
+        "failed": len(failures),
+        "failures": failures,
+        "questions": total_questions,
+        "elapsed_seconds": round(elapsed, 2),
+        "syllabi_per_minute": round(len(results) / minutes, 2) if minutes else 0.0,
+        "questions_per_minute": round(total_questions / minutes, 2) if minutes else 0.0,
+        "p50_seconds_per_syllabus": round(statistics.median(seconds), 2) if seconds else 0.0,
+        "max_seconds_per_syllabus": round(max(seconds), 2) if seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate quizzes for a directory of syllabi.")
+    parser.add_argument("input_dir", type=Path, help="Directory of PDF, DOCX and TXT syllabi (searched recursively)")
+    parser.add_argument("--out", type=Path, default=Path("quizzes"), help="Output directory")
+    parser.add_argument("--type", choices=QUIZ_TYPES, default="MCQ", help="Quiz type")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per syllabus")
+    parser.add_argument("--model", default=QUIZ_MODEL, help=f"Groq model, or '{AUTO}' to route by size and model health")
+    parser.add_argument("--explanations", action="store_true", help="Generate inline explanations")
+    parser.add_argument("--workers", type=int, default=4, help="Syllabi processed at once")
+    parser.add_argument("--rpm", type=int, help="Requests per minute allowed for the model (default: its Groq limit)")
+    parser.add_argument("--tpm", type=int, help="Tokens per minute allowed for the model (default: its Groq limit)")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--structured", action="store_true",
+                        help="Ask for JSON output and validate every question (ignores --fanout)")
+    parser.add_argument("--fanout", action="store_true",
+                        help="Split each quiz into parallel requests of a few questions (faster, more requests)")
+    parser.add_argument("--force", action="store_true", help="Regenerate syllabi that already have outputs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        parser.error("GROQ_API_KEY is not set")
+
+    syllabi = find_syllabi(args.input_dir)
+    pending = [path for path in syllabi
+               if args.force or not is_done(path, output_paths(path, args.input_dir, args.out)[0])]
+    skipped = len(syllabi) - len(pending)
+    print(f"{len(syllabi)} syllabi found, {skipped} already done, {len(pending)} to generate")
+
+    if args.rpm or args.tpm:
+        for model in (MODEL_CONTEXT if args.model == AUTO else [args.model]):
+            rate_limit.set_limits(model, args.rpm, args.tpm)
+    results = []
+    failures = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(process_syllabus, path, args, api_key): path for path in pending}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append({"source": str(path.relative_to(args.input_dir)), "error": str(e)})
+                    print(f"[{len(results) + len(failures)}/{len(pending)}] FAILED {path}: {e}")
+                    continue
+                results.append(result)
+                print(f"[{len(results) + len(failures)}/{len(pending)}] {result['source']}: "
+                      f"{result['questions']} questions in {result['seconds']:.1f}s")
+        except KeyboardInterrupt:
+            print("Interrupted; finished syllabi are kept and will be skipped on the next run")
+            executor.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(results, failures, skipped, elapsed)
+    summary["rate_limits"] = rate_limit.limiter_stats()
+    args.out.mkdir(parents=True, exist_ok=True)
+    write_atomic(args.out / "_summary.json", lambda f: json.dump(summary, f, indent=2))
+    print(f"Generated {summary['generated']} quizzes ({summary['questions']} questions) in "
+          f"{summary['elapsed_seconds']}s: {summary['syllabi_per_minute']} syllabi/min, "
+          f"{summary['questions_per_minute']} questions/min, p50 {summary['p50_seconds_per_syllabus']}s per syllabus; "
+          f"{summary['skipped']} skipped, {summary['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: single-pass quiz parser vs. the old backtracking MCQ regex.
+
+Run from the repository root:
+    python benchmarks/bench_quiz_parser.py --questions 2000 --malformed 0.05
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.quiz_parser import parse_quiz  # noqa: E402
+
+# The pattern app.py used before utils/quiz_parser.py existed
+LEGACY_MCQ_PATTERN = r"Q(\d+)\.\s*(.*?)\s*a\)\s*(.*?)\s*b\)\s*(.*?)\s*c\)\s*(.*?)\s*d\)\s*(.*?)\s*Answer:\s*(\w)"
+
+
+def synthetic_quiz(num_questions, malformed_rate, seed=0):
+    rng = random.Random(seed)
+    words = "syllabus module lecture concept theorem process network memory kernel schedule".split()
+    lines = ["Here are the questions you asked for:", ""]
+    for n in range(1, num_questions + 1):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 30)))
+        lines.append(f"Q{n}. What best describes {sentence}?")
+        options = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 10))) for _ in range(4)]
+        broken = rng.random() < malformed_rate
+        for letter, option in zip("abcd", options):
+            # A malformed question loses its last option
+            if not (broken and letter == "d"):
+                lines.append(f"{letter}) {option}")
+        lines.append(f"Answer: {rng.choice('abcd')}")
+        lines.append(f"Explanation: Because {rng.choice(words)} follows from the {rng.choice(words)}.")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def best_of(repeats, func):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--malformed", type=float, default=0.05, help="fraction of questions missing an option")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    quiz = synthetic_quiz(args.questions, args.malformed)
+    print(f"{args.questions} questions, {len(quiz) / 1024:.0f} KiB of output, {args.malformed:.0%} malformed")
+
+    legacy_time, matches = best_of(args.repeats, lambda: re.findall(LEGACY_MCQ_PATTERN, quiz, re.DOTALL))
+    parser_time, (questions, diagnostics) = best_of(args.repeats, lambda: parse_quiz(quiz, "MCQ"))
+
+    print(f"legacy regex : {legacy_time * 1000:8.1f} ms  {len(matches)} questions (malformed ones merged into neighbours)")
+    print(f"quiz_parser  : {parser_time * 1000:8.1f} ms  {len(questions)} questions, {len(diagnostics)} diagnostics")
+
+    # Markdown-bold answers ("**Answer:** b") never satisfy the legacy pattern, and every
+    # failed match backtracks through the lazy groups of all following questions. The
+    # cost explodes with the number of questions, so this scenario stays at sizes that finish.
+    print()
+    print("Markdown answers ('**Answer:** b'):")
+    for num_questions in (2, 4, 6, 8):
+        quiz = synthetic_quiz(num_questions, 0).replace("Answer: ", "**Answer:** ")
+        legacy_time, matches = best_of(1, lambda: re.findall(LEGACY_MCQ_PATTERN, quiz, re.DOTALL))
+        parser_time, (questions, _) = best_of(args.repeats, lambda: parse_quiz(quiz, "MCQ"))
+        print(f"  {num_questions:2d} questions  legacy regex {legacy_time * 1000:9.1f} ms ({len(matches)} parsed)"
+              f"  quiz_parser {parser_time * 1000:6.2f} ms ({len(questions)} parsed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ c = conn.cursor()
 
 # Delete all records from the scores table
 c.execute("DELETE FROM scores")
+c.execute("DELETE FROM leaderboard_summary")
 
 # Commit the changes
 conn.commit()
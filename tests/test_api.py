@@ -0,0 +1,120 @@
+"""
+Smoke test of every HTTP API endpoint against the stub LLM (QUIZGEN_STUB_LLM=1).
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import importlib
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+SYLLABUS = "\n\n".join(f"Unit {i}. Cells divide by mitosis and meiosis; stage {i} covers the cell cycle."
+                       for i in range(1, 9))
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The database path is relative, so run in a scratch directory to keep quizgen.db untouched
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp_path_factory.mktemp("api"))
+    monkeypatch.setenv("QUIZGEN_STUB_LLM", "1")
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    api = importlib.import_module("api")
+    with TestClient(api.app) as test_client:
+        yield test_client
+    monkeypatch.undo()
+
+
+def test_extract(client):
+    response = client.post("/extract", files={"file": ("syllabus.txt", SYLLABUS.encode(), "text/plain")})
+    assert response.status_code == 200
+    assert "mitosis" in response.json()["text"]
+
+    response = client.post("/extract", files={"file": ("syllabus.exe", b"MZ", "application/octet-stream")})
+    assert response.status_code == 415
+
+
+def test_topics(client):
+    response = client.post("/topics", json={"text": SYLLABUS})
+    assert response.status_code == 200
+    assert response.json()["topics"]
+
+
+@pytest.mark.parametrize("params", [
+    {"quiz_type": "MCQ", "num_questions": 5},
+    {"quiz_type": "True/False", "num_questions": 4, "with_explanations": True},
+    {"quiz_type": "MCQ", "num_questions": 3, "structured": True},
+    {"quiz_type": "Mixed", "num_questions": 6},
+    {"quiz_type": "Mixed", "num_questions": 6, "structured": True},
+])
+def test_generate(client, params):
+    response = client.post("/generate", json=dict(params, text=SYLLABUS))
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["questions"]) == params["num_questions"]
+    assert body["quiz"].startswith("Q1.")
+    assert body["diagnostics"] == []
+
+
+def test_generate_rejects_unknown_quiz_type(client):
+    response = client.post("/generate", json={"text": SYLLABUS, "quiz_type": "Essay"})
+    assert response.status_code == 422
+
+
+def test_generate_rejects_unknown_model(client):
+    response = client.post("/generate", json={"text": SYLLABUS, "model": "gpt-nonexistent"})
+    assert response.status_code == 422
+    assert client.post("/generate", json={"text": SYLLABUS, "model": "auto"}).status_code == 200
+
+
+def test_generate_covers_syllabus_larger_than_any_context(client):
+    syllabus = "\n\n".join(f"Chapter {i}. " + "Enzymes lower the activation energy of reactions. " * 40
+                            for i in range(300))
+    response = client.post("/generate", json={"text": syllabus, "num_questions": 10})
+    assert response.status_code == 200
+    # The stub tags questions with their prompt: several tags mean several sections were sent
+    tags = set(re.findall(r"\[([0-9a-f]{6})\]", response.json()["quiz"]))
+    assert len(tags) > 1
+
+
+def test_slot_lets_cancellation_through(client):
+    api = importlib.import_module("api")
+
+    async def disconnected():
+        async with api._Slot("llm", "generate"):
+            raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(disconnected())
+
+
+def test_explain(client):
+    questions = [{"question": "Which process produces gametes?", "correct": "b",
+                  "options": {"a": "Mitosis", "b": "Meiosis", "c": "Osmosis", "d": "Diffusion"}}]
+    response = client.post("/explain", json={"questions": questions})
+    assert response.status_code == 200
+    assert response.json()["explanations"]["0"]
+
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+def test_metrics(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.json()
+    for section in ("endpoints", "limits", "llm_clients", "rate_limits", "models", "quiz_cache", "db_pool"):
+        assert section in body
@@ -0,0 +1,61 @@
+"""
+Unit tests of the quiz parser on model output the benchmark's synthetic quizzes don't cover.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.quiz_parser import parse_quiz, validate_question  # noqa: E402
+
+CELL_WALL_QUIZ = """Q1. Which structure surrounds a plant cell?
+a) A nucleus
+b) A vacuole
+c) A cell wall
+d) A ribosome
+Answer: A cell wall
+"""
+
+BOLD_QUIZ = """**Q1.** Which process produces gametes?
+**a)** Mitosis
+**b)** Meiosis
+**c)** Osmosis
+**d)** Diffusion
+**Answer:** b
+"""
+
+
+def test_answer_given_as_option_text_starting_with_article():
+    questions, diagnostics = parse_quiz(CELL_WALL_QUIZ, "MCQ")
+    assert diagnostics == []
+    assert questions[0].answer == "c"
+
+
+def test_answer_text_that_is_no_option_is_reported():
+    questions, diagnostics = parse_quiz(CELL_WALL_QUIZ.replace("Answer: A cell wall", "Answer: A membrane"), "MCQ")
+    assert questions == []
+    assert "not one of the options" in diagnostics[0].message
+
+
+def test_answer_letter_forms():
+    for answer in ("c", "C", "c)", "(c)", "C.", "c: A cell wall", "C) A cell wall"):
+        questions, diagnostics = parse_quiz(CELL_WALL_QUIZ.replace("Answer: A cell wall", f"Answer: {answer}"),
+                                            "MCQ")
+        assert diagnostics == [], answer
+        assert questions[0].answer == "c", answer
+
+
+def test_markdown_bold_options():
+    questions, diagnostics = parse_quiz(BOLD_QUIZ, "MCQ")
+    assert diagnostics == []
+    assert questions[0].options == {"a": "Mitosis", "b": "Meiosis", "c": "Osmosis", "d": "Diffusion"}
+    assert questions[0].answer == "b"
+
+
+def test_structured_answer_given_as_option_text():
+    item = {"question": "Which structure surrounds a plant cell?", "answer": "A cell wall",
+            "options": {"a": "A nucleus", "b": "A vacuole", "c": "A cell wall", "d": "A ribosome"}}
+    assert validate_question(item, "MCQ").answer == "c"
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from utils.db import DB_PATH, connection
+
+
+def content_hash(data):
+    """
+    Returns a stable SHA-256 hex digest for bytes or text.
+
+    Args:
+        data: Bytes or string to hash
+
+    Returns:
+        str: Hex digest
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache bounded by entry count and total size.
+
+    Args:
+        max_entries: Maximum number of entries kept
+        max_bytes: Maximum combined size of all values
+        sizeof: Callable returning the size of a value (defaults to len)
+    """
+
+    def __init__(self, max_entries=32, max_bytes=64 * 1024 * 1024, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if size > self.max_bytes:
+                # Never cache a value that would evict everything else
+                return
+            if key in self._data:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._data[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+            while len(self._data) > self.max_entries or self._total_bytes > self.max_bytes:
+                old_key, _ = self._data.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class PersistentCache:
+    """
+    SQLite-backed key/value cache shared by every session and surviving restarts.
+
+    Values are stored as JSON and expire after ttl_seconds. When max_entries or
+    max_bytes is set, the least recently used entries of the namespace are
+    evicted to stay within the limit.
+
+    Args:
+        namespace: Name separating this cache's keys from other caches
+        ttl_seconds: Lifetime of an entry
+        max_entries: Maximum number of entries in the namespace (None for no limit)
+        max_bytes: Maximum combined size of the stored values (None for no limit)
+        db_path: SQLite database file
+    """
+
+    def __init__(self, namespace, ttl_seconds, max_entries=None, max_bytes=None, db_path=DB_PATH):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        with connection(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, key)
+            )''')
+            # Databases created before LRU eviction lack the access/size columns
+            columns = [row[1] for row in c.execute("PRAGMA table_info(cache)")]
+            if "last_access" not in columns:
+                c.execute("ALTER TABLE cache ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            if "size" not in columns:
+                c.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache (namespace, last_access)")
+        self.purge_expired()
+
+    def get(self, key):
+        now = time.time()
+        with connection(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute("SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                      (self.namespace, key))
+            result = c.fetchone()
+            if result and result[1] <= now:
+                c.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                result = None
+            elif result:
+                c.execute("UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?",
+                          (now, self.namespace, key))
+        if result:
+            self.hits += 1
+            return json.loads(result[0])
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        now = time.time()
+        data = json.dumps(value)
+        with connection(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute("""INSERT OR REPLACE INTO cache (namespace, key, value, created_at, expires_at, last_access, size)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                      (self.namespace, key, data, now, now + self.ttl_seconds, now, len(data)))
+            if self.max_entries is not None:
+                c.execute("""DELETE FROM cache WHERE namespace = ? AND key IN (
+                                 SELECT key FROM cache WHERE namespace = ?
+                                 ORDER BY last_access DESC LIMIT -1 OFFSET ?)""",
+                          (self.namespace, self.namespace, self.max_entries))
+            if self.max_bytes is not None:
+                c.execute("""DELETE FROM cache WHERE namespace = ? AND key IN (
+                                 SELECT key FROM (
+                                     SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running
+                                     FROM cache WHERE namespace = ?)
+                                 WHERE running > ?)""",
+                          (self.namespace, self.namespace, self.max_bytes))
+
+    def purge_expired(self):
+        with connection(self.db_path) as conn:
+            return conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def stats(self):
+        with connection(self.db_path) as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,92 @@
+import re
+from utils.tokens import CHARS_PER_TOKEN
+
+
+def split_text(text, max_tokens):
+    """
+    Splits text into sections of at most max_tokens, on paragraph boundaries where possible.
+
+    Paragraphs larger than the budget are split on sentence boundaries, and
+    sentences larger than the budget are cut at the character limit.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget of each section
+
+    Returns:
+        list: Non-empty text sections, in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+|\n", paragraph):
+            for start in range(0, len(sentence), max_chars):
+                pieces.append(sentence[start:start + max_chars])
+
+    sections = []
+    current = []
+    current_len = 0
+    for piece in pieces:
+        if current and current_len + len(piece) + 2 > max_chars:
+            sections.append("\n\n".join(current))
+            current = []
+            current_len = 0
+        current.append(piece)
+        current_len += len(piece) + 2
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def split_even(text, parts):
+    """
+    Splits text into at most parts consecutive sections of about equal length.
+
+    Boundaries fall between paragraphs or sentences, as in split_text.
+
+    Args:
+        text: Text to split
+        parts: Number of sections wanted
+
+    Returns:
+        list: Non-empty text sections, in document order
+    """
+    # Split finer than needed, then pack the pieces into parts groups by position
+    piece_tokens = max(1, -(-len(text) // (CHARS_PER_TOKEN * parts * 4)))
+    pieces = split_text(text, piece_tokens)
+    total = sum(len(piece) for piece in pieces)
+    groups = [[] for _ in range(parts)]
+    offset = 0
+    for piece in pieces:
+        middle = offset + len(piece) / 2
+        groups[min(parts - 1, int(middle * parts / total))].append(piece)
+        offset += len(piece)
+    return ["\n\n".join(group) for group in groups if group]
+
+
+def allocate(total, weights):
+    """
+    Splits an integer total across weights proportionally (largest remainder method).
+
+    Args:
+        total: Amount to distribute
+        weights: Non-negative weight per bucket
+
+    Returns:
+        list: Integer share per bucket, summing to total
+    """
+    weight_sum = sum(weights)
+    if not weights or weight_sum <= 0:
+        return [total] + [0] * (len(weights) - 1) if weights else []
+    exact = [total * w / weight_sum for w in weights]
+    shares = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in by_remainder[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
@@ -0,0 +1,262 @@
+import hashlib
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DB_PATH = "quizgen.db"
+
+# Applied to every pooled connection. WAL lets readers run alongside the single
+# writer, so concurrent Streamlit sessions no longer fail with "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of long-lived SQLite connections to one database file.
+
+    Connections are opened lazily up to size and handed out one thread at a
+    time. Each keeps sqlite3's compiled-statement cache warm, so the module-level
+    SQL below is prepared once per connection instead of once per call.
+
+    Args:
+        db_path: SQLite database file
+        size: Maximum number of open connections
+        timeout: Seconds to wait for a free connection before raising
+    """
+
+    def __init__(self, db_path=DB_PATH, size=8, timeout=30):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._waits = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+            self._waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of a with block.
+
+        The work done in the block is committed when it exits normally and
+        rolled back when it raises.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "waits": self._waits,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Returns the process-wide pool for a database file, creating it on first use."""
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
+
+
+def connection(db_path=DB_PATH):
+    """Shortcut for get_pool(db_path).connection()."""
+    return get_pool(db_path).connection()
+
+
+# Users and scores
+CREATE_USERS = '''CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+)'''
+CREATE_SCORES = '''CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    score INTEGER,
+    total_questions INTEGER,
+    quiz_date TEXT,
+    FOREIGN KEY (username) REFERENCES users (username)
+)'''
+INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
+SELECT_PASSWORD = "SELECT password FROM users WHERE username = ?"
+INSERT_SCORE = "INSERT INTO scores (username, score, total_questions, quiz_date) VALUES (?, ?, ?, ?)"
+
+# Per-user leaderboard rows, maintained in the same transaction as every score
+# insert. period is 'all', 'day:YYYY-MM-DD' or 'week:YYYY-Www' (Monday-based weeks,
+# as SQLite's strftime('%W')), so every window is a primary-key range lookup.
+CREATE_LEADERBOARD = '''CREATE TABLE IF NOT EXISTS leaderboard_summary (
+    period TEXT NOT NULL,
+    username TEXT NOT NULL,
+    best_percentage REAL,
+    best_score INTEGER,
+    best_total INTEGER,
+    attempts INTEGER NOT NULL,
+    last_date TEXT,
+    PRIMARY KEY (period, username)
+)'''
+CREATE_LEADERBOARD_INDEX = "CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard_summary (period, best_percentage DESC)"
+UPSERT_LEADERBOARD = """
+    INSERT INTO leaderboard_summary (period, username, best_percentage, best_score, best_total, attempts, last_date)
+    VALUES (?, ?, ? * 100.0 / ?, ?, ?, 1, ?)
+    ON CONFLICT (period, username) DO UPDATE SET
+        -- A quiz with no questions has no percentage; two-argument MAX would keep that NULL for good
+        best_percentage = MAX(COALESCE(best_percentage, excluded.best_percentage),
+                              COALESCE(excluded.best_percentage, best_percentage)),
+        best_score = MAX(best_score, excluded.best_score),
+        best_total = MAX(best_total, excluded.best_total),
+        attempts = attempts + 1,
+        last_date = MAX(last_date, excluded.last_date)
+"""
+REBUILD_LEADERBOARD = """
+    INSERT INTO leaderboard_summary (period, username, best_percentage, best_score, best_total, attempts, last_date)
+    SELECT {period}, username, MAX(score * 100.0 / total_questions), MAX(score), MAX(total_questions),
+           COUNT(*), MAX(quiz_date)
+    FROM scores
+    GROUP BY {period}, username
+"""
+SELECT_LEADERBOARD = """
+    SELECT username, best_percentage, best_score, best_total, last_date, attempts
+    FROM leaderboard_summary
+    WHERE period = ?
+    ORDER BY best_percentage DESC
+    LIMIT 10
+"""
+PRUNE_DAILY_LEADERBOARD = "DELETE FROM leaderboard_summary WHERE period LIKE 'day:%' AND period < 'day:' || date('now', '-7 days')"
+
+LEADERBOARD_WINDOWS = ("all", "week", "day")
+
+
+def leaderboard_periods(when):
+    """Returns the leaderboard period keys ('all', week, day) a timestamp falls into."""
+    return ("all", when.strftime("week:%Y-W%W"), when.strftime("day:%Y-%m-%d"))
+
+
+# Initialize SQLite database
+def init_db():
+    with connection() as conn:
+        conn.execute(CREATE_USERS)
+        conn.execute(CREATE_SCORES)
+        conn.execute(CREATE_LEADERBOARD)
+        conn.execute(CREATE_LEADERBOARD_INDEX)
+        conn.execute(PRUNE_DAILY_LEADERBOARD)
+        # Databases with scores from before the summary table existed are backfilled once
+        summary_empty = conn.execute("SELECT 1 FROM leaderboard_summary LIMIT 1").fetchone() is None
+        if summary_empty and conn.execute("SELECT 1 FROM scores LIMIT 1").fetchone():
+            rebuild_leaderboard(conn)
+
+
+def rebuild_leaderboard(conn):
+    """Recomputes the whole leaderboard summary from the scores table."""
+    conn.execute("DELETE FROM leaderboard_summary")
+    conn.execute(REBUILD_LEADERBOARD.format(period="'all'"))
+    conn.execute(REBUILD_LEADERBOARD.format(period="strftime('week:%Y-W%W', quiz_date)"))
+    conn.execute(REBUILD_LEADERBOARD.format(period="strftime('day:%Y-%m-%d', quiz_date)"))
+
+
+# Hash password
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+# Register user
+def register_user(username, password):
+    try:
+        with connection() as conn:
+            conn.execute(INSERT_USER, (username, hash_password(password)))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+# Authenticate user
+def authenticate_user(username, password):
+    with connection() as conn:
+        result = conn.execute(SELECT_PASSWORD, (username,)).fetchone()
+    if result and result[0] == hash_password(password):
+        return True
+    return False
+
+
+# Save score
+def save_score(username, score, total_questions):
+    now = datetime.now(timezone.utc)
+    quiz_date = now.strftime("%Y-%m-%d %H:%M:%S")
+    with connection() as conn:
+        conn.execute(INSERT_SCORE, (username, score, total_questions, quiz_date))
+        conn.executemany(UPSERT_LEADERBOARD, [
+            (period, username, score, total_questions, score, total_questions, quiz_date)
+            for period in leaderboard_periods(now)
+        ])
+
+
+# Get leaderboard data
+def get_leaderboard(window="all"):
+    """
+    Returns the top 10 users for a leaderboard window.
+
+    Args:
+        window: 'all' (all time), 'week' (current week) or 'day' (today, UTC)
+
+    Returns:
+        list: (username, percentage, score, total_questions, quiz_date, attempts) rows
+    """
+    periods = dict(zip(LEADERBOARD_WINDOWS, leaderboard_periods(datetime.now(timezone.utc))))
+    with connection() as conn:
+        return conn.execute(SELECT_LEADERBOARD, (periods[window],)).fetchall()
@@ -1,48 +1,273 @@
 
+import codecs
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import zipfile
+import xml.etree.ElementTree as ET
 import PyPDF2
-from docx import Document
+from utils.cache import LRUCache, content_hash
+from utils.tokens import CHARS_PER_TOKEN
 
-def extract_text(file, file_type):
+# Bytes decoded at a time from plain-text uploads
+TXT_BLOCK_SIZE = 64 * 1024
+
+# WordprocessingML namespace used by word/document.xml
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# PDFs with at least this many pages are extracted across a process pool;
+# below it the pool start-up costs more than it saves
+PARALLEL_PDF_MIN_PAGES = 40
+
+# Worker processes in the shared PDF pool. The pool is shared by every caller
+# (batch workers, API extraction slots), so this bounds the total, not a per-file count.
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+# Extracted text keyed by (hash of uploaded bytes, MIME type). Streamlit reruns the
+# whole script on every widget interaction, so without this an upload is re-parsed
+# on every click while it stays in the uploader.
+_extraction_cache = LRUCache(max_entries=32, max_bytes=64 * 1024 * 1024)
+
+def iter_text(file, file_type):
+    """
+    Lazily yields the text of a document one section at a time.
+
+    PDFs are yielded page by page, DOCX files paragraph by paragraph and TXT
+    files in decoded blocks, so callers can stop reading as soon as they have
+    enough text.
+
+    Args:
+        file: Uploaded file object
+        file_type: MIME type of the file
+
+    Yields:
+        str: Text of the next section
+    """
+    if file_type == "application/pdf":
+        # Handle PDF files
+        pdf_reader = PyPDF2.PdfReader(file)
+        if len(pdf_reader.pages) >= PARALLEL_PDF_MIN_PAGES and PDF_WORKERS > 1:
+            file.seek(0)
+            pages = iter_pdf_pages_parallel(file.read(), len(pdf_reader.pages))
+        else:
+            pages = (page.extract_text() for page in pdf_reader.pages)
+        for page_text in pages:
+            if page_text:
+                yield page_text
+
+    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        # Handle DOCX files
+        yield from iter_docx_text(file)
+
+    elif file_type == "text/plain":
+        # Handle TXT files
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for block in iter(lambda: file.read(TXT_BLOCK_SIZE), b""):
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
+    else:
+        raise ValueError("Unsupported file type")
+
+def iter_docx_text(file):
+    """
+    Streams the body text of a DOCX file straight from word/document.xml.
+
+    Paragraphs are yielded in document order. Tables are yielded row by row with
+    cells joined by ' | ', which keeps week-by-week syllabus tables readable.
+    Elements are discarded as soon as they are read, so memory stays flat
+    regardless of document size.
+
+    Args:
+        file: DOCX file object
+
+    Yields:
+        str: Text of the next paragraph or table row
+    """
+    with zipfile.ZipFile(file) as docx, docx.open("word/document.xml") as xml:
+        runs = []       # text of the paragraph being read
+        cells = []      # stack of paragraph lists, one per open table cell
+        rows = []       # stack of cell lists, one per open table row
+        for event, elem in ET.iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == W_NS + "tc":
+                    cells.append([])
+                elif tag == W_NS + "tr":
+                    rows.append([])
+                continue
+
+            if tag == W_NS + "t":
+                runs.append(elem.text or "")
+            elif tag == W_NS + "tab":
+                runs.append("\t")
+            elif tag in (W_NS + "br", W_NS + "cr"):
+                runs.append("\n")
+            elif tag == W_NS + "p":
+                text = "".join(runs)
+                runs = []
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == W_NS + "tc":
+                paragraphs = cells.pop()
+                rows[-1].append(" ".join(p.strip() for p in paragraphs if p.strip()))
+            elif tag == W_NS + "tr":
+                row = " | ".join(rows.pop())
+                # Rows of a nested table become part of the enclosing cell
+                if cells:
+                    cells[-1].append(row)
+                else:
+                    yield row
+            elem.clear()
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# Parsed PDF of the last file a worker process handled, as (path, reader)
+_worker_pdf = (None, None)
+
+def _get_pdf_pool():
+    # Started on first use and shared for the life of the process. Spawned rather
+    # than forked: forking a process that runs Streamlit/uvicorn threads can deadlock.
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+def _discard_pdf_pool(executor):
+    # A broken pool refuses all work; the next large PDF starts a new one
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is executor:
+            _pdf_pool = None
+    executor.shutdown(wait=False)
+
+def _extract_page_range(path, start, stop):
+    # Each worker parses a file once and keeps it for the following ranges
+    global _worker_pdf
+    if _worker_pdf[0] != path:
+        with open(path, "rb") as f:
+            _worker_pdf = (path, PyPDF2.PdfReader(io.BytesIO(f.read())))
+    reader = _worker_pdf[1]
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+def iter_pdf_pages_parallel(data, num_pages):
+    """
+    Extracts PDF pages in the shared worker pool, yielding them in page order.
+
+    Page extraction is CPU-bound, so the pages are split into contiguous ranges
+    (a few per worker, to even out slow pages) and handed to the pool. The PDF
+    is passed to the workers through a temporary file rather than pickled with
+    every range. If a worker dies, the pool is replaced for later files and the
+    rest of this one is extracted in-process.
+
+    Args:
+        data: Bytes of the PDF
+        num_pages: Number of pages in the PDF
+
+    Yields:
+        str: Text of each page (may be empty)
+    """
+    range_size = max(1, -(-num_pages // (PDF_WORKERS * 4)))
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    futures = []
+    next_page = 0
+    try:
+        executor = _get_pdf_pool()
+        try:
+            futures = [executor.submit(_extract_page_range, path, start, min(start + range_size, num_pages))
+                       for start in range(0, num_pages, range_size)]
+            for future in futures:
+                page_texts = future.result()
+                next_page += len(page_texts)
+                yield from page_texts
+        except BrokenProcessPool as e:
+            # A worker died, e.g. out of memory or crashed on a malformed page
+            print(f"PDF worker pool failed ({e}); extracting pages {next_page + 1}-{num_pages} in-process")
+            _discard_pdf_pool(executor)
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            for i in range(next_page, num_pages):
+                yield reader.pages[i].extract_text()
+    finally:
+        # A caller stopping early (e.g. at a text budget) cancels the ranges not started yet;
+        # ranges already running finish, so wait for them before removing the file
+        for future in futures:
+            future.cancel()
+        for future in futures:
+            if not future.cancelled():
+                future.exception()
+        os.remove(path)
+
+def extract_text(file, file_type, max_chars=None, max_tokens=None):
     """
     Extracts text from uploaded files based on file type (PDF, DOCX, TXT).
     
     Args:
         file: Uploaded file object
         file_type: Type of the file ('application/pdf', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'text/plain')
+        max_chars: Stop reading once this many characters have been extracted
+        max_tokens: Stop reading once roughly this many tokens have been extracted
     
     Returns:
         str: Extracted text
     """
-    text = ""
-    
+    if max_tokens is not None:
+        token_chars = max_tokens * CHARS_PER_TOKEN
+        max_chars = token_chars if max_chars is None else min(max_chars, token_chars)
+
     try:
-        if file_type == "application/pdf":
-            # Handle PDF files
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        
-        elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            # Handle DOCX files
-            doc = Document(file)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        
-        elif file_type == "text/plain":
-            # Handle TXT files
-            text = file.read().decode("utf-8")
-        
-        else:
-            raise ValueError("Unsupported file type")
+        # Sections are collected and joined once: linear in the size of the document
+        parts = []
+        length = 0
+        separator = "" if file_type == "text/plain" else "\n"
+        for section in iter_text(file, file_type):
+            if max_chars is not None and length + len(section) >= max_chars:
+                parts.append(section[:max_chars - length])
+                break
+            parts.append(section)
+            length += len(section) + len(separator)
         
         # Clean up text
-        text = text.strip()
+        text = separator.join(parts).strip()
         if not text:
             raise ValueError("No text could be extracted from the file")
         
         return text
     
     except Exception as e:
-        raise Exception(f"Error extracting text: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error extracting text: {str(e)}")
+
+
+def extract_text_cached(file, file_type):
+    """
+    Same as extract_text, but memoizes the result on the content of the file.
+
+    Args:
+        file: Uploaded file object
+        file_type: MIME type of the file
+
+    Returns:
+        str: Extracted text
+    """
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    key = (content_hash(data), file_type)
+    text = _extraction_cache.get(key)
+    if text is None:
+        text = extract_text(io.BytesIO(data), file_type)
+        _extraction_cache.set(key, text)
+    return text
+
+
+def extraction_cache_stats():
+    """Returns hit/miss counters and size of the extraction cache."""
+    return _extraction_cache.stats()
\ No newline at end of file
@@ -0,0 +1,347 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from utils.cache import content_hash
+from utils.db import DB_PATH, connection
+from utils.quiz_generator import (stream_quiz, generate_quiz_chunked, generate_quiz_fanout, fanout_factor,
+                                  extract_topics, generate_explanations, top_up_questions, plan_quiz_request,
+                                  generate_mixed_quiz, mixed_sections, generate_quiz_structured, focus_on_topics,
+                                  QUIZ_MODEL)
+from utils.quiz_parser import MIXED, QuizParser, format_quiz, parse_quiz
+from utils.router import candidates
+
+# Jobs run at once in this process
+JOB_WORKERS = 4
+
+# A job still 'running' this long after its last update belonged to a process that
+# died (e.g. a server restart) and is queued again
+JOB_LEASE_SECONDS = 10 * 60
+
+# Finished jobs are kept this long, so results survive refreshes and reconnects
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+PENDING = ("queued", "running")
+
+CREATE_JOBS = '''CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    preview TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)'''
+CREATE_JOBS_INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at)"
+# A job submitted again is reused while queued, running or done; a failed one is queued again
+INSERT_JOB = """
+    INSERT INTO jobs (id, kind, params, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)
+    ON CONFLICT (id) DO UPDATE SET status = 'queued', error = NULL, progress = 0, preview = NULL,
+                                   updated_at = excluded.updated_at
+    WHERE jobs.status = 'failed'
+"""
+CLAIM_JOB = """UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+               WHERE id = ? AND status = 'queued'"""
+SELECT_JOB = "SELECT id, kind, params, status, progress, message, preview, result, error FROM jobs WHERE id = ?"
+# The preview is left as it was unless a new one is given
+UPDATE_PROGRESS = "UPDATE jobs SET progress = ?, message = ?, preview = COALESCE(?, preview), updated_at = ? WHERE id = ?"
+FINISH_JOB = "UPDATE jobs SET status = ?, progress = 1, preview = NULL, result = ?, error = ?, updated_at = ? WHERE id = ?"
+REQUEUE_STALE = "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?"
+SELECT_QUEUED = "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+PURGE_JOBS = "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?"
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+_handlers = {}
+_dispatched = set()
+_dispatched_lock = threading.Lock()
+# API keys stay in memory, never in the jobs table; jobs resumed after a restart use GROQ_API_KEY
+_api_keys = {}
+
+
+def init_jobs(db_path=DB_PATH):
+    """Creates the jobs table, drops old results and resumes jobs left behind by a dead process."""
+    now = time.time()
+    with connection(db_path) as conn:
+        conn.execute(CREATE_JOBS)
+        # Databases created before live previews lack the preview column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if "preview" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN preview TEXT")
+        conn.execute(CREATE_JOBS_INDEX)
+        conn.execute(PURGE_JOBS, (now - JOB_RETENTION_SECONDS,))
+        conn.execute(REQUEUE_STALE, (now, now - JOB_LEASE_SECONDS))
+        queued = [row[0] for row in conn.execute(SELECT_QUEUED).fetchall()]
+    for job_id in queued:
+        _dispatch(job_id, db_path)
+
+
+def register_handler(kind, handler):
+    """
+    Registers the function that runs jobs of a kind.
+
+    Args:
+        kind: Job kind, e.g. 'generate'
+        handler: Callable (params, api_key, progress) returning a JSON-serializable
+            result; progress(fraction, message, preview) reports how far the job is,
+            optionally with a JSON-serializable partial result to show meanwhile
+    """
+    _handlers[kind] = handler
+
+
+def submit_job(kind, params, api_key=None, dedupe=True, db_path=DB_PATH):
+    """
+    Queues a job and starts it on the worker pool.
+
+    With dedupe, the job id is derived from kind and params, so submitting the
+    same job twice returns the first one (and its result, once done) instead
+    of doing the work again.
+
+    Args:
+        kind: Registered job kind
+        params: JSON-serializable job parameters
+        api_key: Groq API key the job runs with
+        dedupe: Reuse an identical earlier job
+        db_path: SQLite database file
+
+    Returns:
+        str: Job id
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    payload = json.dumps(params, sort_keys=True)
+    job_id = content_hash(f"{kind}:{payload}") if dedupe else uuid.uuid4().hex
+    now = time.time()
+    with connection(db_path) as conn:
+        conn.execute(INSERT_JOB, (job_id, kind, payload, now, now))
+        status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    # A duplicate of a job that is already running or done needs no worker
+    if status == "queued":
+        if api_key:
+            _api_keys[job_id] = api_key
+        _dispatch(job_id, db_path)
+    return job_id
+
+
+def get_job(job_id, db_path=DB_PATH):
+    """
+    Returns the state of a job.
+
+    Returns:
+        dict: {"id", "kind", "params", "status", "progress", "message", "preview", "result", "error"},
+            or None for an unknown id. status is 'queued', 'running', 'done' or 'failed';
+            preview is the partial result last reported by a running job, if any.
+    """
+    with connection(db_path) as conn:
+        row = conn.execute(SELECT_JOB, (job_id,)).fetchone()
+    if row is None:
+        return None
+    job_id, kind, params, status, progress, message, preview, result, error = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "params": json.loads(params),
+        "status": status,
+        "progress": progress,
+        "message": message,
+        "preview": json.loads(preview) if preview is not None else None,
+        "result": json.loads(result) if result is not None else None,
+        "error": error,
+    }
+
+
+def wait_for_job(job_id, on_progress=None, poll_interval=0.5, timeout=None, db_path=DB_PATH):
+    """
+    Polls a job until it is done or failed.
+
+    Args:
+        job_id: Job id
+        on_progress: Called with the job dict after every poll while it is pending
+        poll_interval: Seconds between polls
+        timeout: Give up after this many seconds and return the pending job
+
+    Returns:
+        dict: Last job state (see get_job)
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        job = get_job(job_id, db_path)
+        if job is None or job["status"] not in PENDING:
+            return job
+        if on_progress:
+            on_progress(job)
+        if deadline and time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+
+def _dispatch(job_id, db_path):
+    with _dispatched_lock:
+        if job_id in _dispatched:
+            return
+        _dispatched.add(job_id)
+    _executor.submit(_run, job_id, db_path)
+
+
+def _run(job_id, db_path):
+    try:
+        with connection(db_path) as conn:
+            # Only one worker, in any process, gets to claim a queued job
+            if conn.execute(CLAIM_JOB, (time.time(), job_id)).rowcount != 1:
+                return
+            kind, params = conn.execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        def progress(fraction, message=None, preview=None):
+            preview = json.dumps(preview) if preview is not None else None
+            with connection(db_path) as conn:
+                conn.execute(UPDATE_PROGRESS, (fraction, message, preview, time.time(), job_id))
+
+        api_key = _api_keys.get(job_id) or os.getenv("GROQ_API_KEY")
+        try:
+            result = _handlers[kind](json.loads(params), api_key, progress)
+            status, result, error = "done", json.dumps(result), None
+        except Exception as e:
+            status, result, error = "failed", None, str(e)
+        with connection(db_path) as conn:
+            conn.execute(FINISH_JOB, (status, result, error, time.time(), job_id))
+    finally:
+        with _dispatched_lock:
+            _dispatched.discard(job_id)
+            _api_keys.pop(job_id, None)
+
+
+# Job handlers
+
+def _generate(params, api_key, progress):
+    # An explicit model is used as is; 'auto' fails over to the next healthiest model
+    models = candidates(params.get("model", QUIZ_MODEL), params["num_questions"])
+    for i, model in enumerate(models):
+        try:
+            return _generate_on(model, params, api_key, progress)
+        except Exception as e:
+            if i == len(models) - 1:
+                raise
+            # Questions previewed from the failed model are not part of the new attempt
+            progress(0.0, f"{model} failed ({e}), switching to {models[i + 1]}", [])
+
+
+def _generate_on(model, params, api_key, progress):
+    topics = params.get("topics") or []
+    text = focus_on_topics(params["text"], topics)
+    quiz_type = params["quiz_type"]
+    num_questions = params["num_questions"]
+    with_explanations = params.get("with_explanations", False)
+    if quiz_type == MIXED:
+        return _generate_mixed(model, params, api_key, progress)
+    plan = plan_quiz_request(text, quiz_type, num_questions, with_explanations, model)
+    progress(0.0, plan.describe())
+
+    if plan.action == "chunk":
+        # Too large for any model's context: generate per section in parallel and merge
+        # (plain-text output, even when structured output was asked for)
+        def section_done(done, total, partial):
+            # Also keeps the job's lease fresh while sections take their time
+            progress(done / total, f"{done}/{total} sections of the syllabus done", _preview(partial, quiz_type))
+
+        quiz = generate_quiz_chunked(text, quiz_type, num_questions, api_key, with_explanations=with_explanations,
+                                     fresh=params.get("fresh", False), model_name=plan.model,
+                                     on_progress=section_done)
+        questions, diagnostics = parse_quiz(quiz, quiz_type)
+    elif params.get("structured"):
+        # JSON output validated per question; bad or missing ones are re-requested
+        progress(0.0, f"{plan.describe()}, structured output")
+        questions, diagnostics = generate_quiz_structured(text, quiz_type, num_questions, api_key, with_explanations,
+                                                          params.get("fresh", False), model_name=plan.model)
+        quiz = format_quiz(questions)
+    elif fanout_factor(num_questions) > 1:
+        # Larger quizzes are decoded as several smaller requests in parallel, each on its
+        # own share of the selected topics; finished parts are previewed meanwhile
+        def part_done(done, total, partial):
+            progress(done / total, f"{done}/{total} parts of the quiz ready", _preview(partial, quiz_type))
+
+        quiz = generate_quiz_fanout(params["text"], quiz_type, num_questions, api_key, with_explanations,
+                                    topics=topics, fresh=params.get("fresh", False), model_name=plan.model,
+                                    on_progress=part_done)
+        questions, diagnostics = parse_quiz(quiz, quiz_type)
+    else:
+        parser = QuizParser(quiz_type, expect_explanations=with_explanations)
+        chunks = []
+        questions = []
+        for chunk in stream_quiz(text, quiz_type, num_questions, api_key, with_explanations=with_explanations,
+                                 fresh=params.get("fresh", False), model_name=plan.model):
+            chunks.append(chunk)
+            completed = parser.feed(chunk)
+            if completed:
+                questions.extend(completed)
+                # The questions so far are shown while the rest are generated
+                progress(min(len(questions) / num_questions, 1.0), f"{len(questions)}/{num_questions} questions ready",
+                         [q.to_dict() for q in questions])
+        quiz = "".join(chunks)
+        questions += parser.close()
+        diagnostics = parser.diagnostics
+
+    if len(questions) < num_questions:
+        # Re-request only the missing or malformed questions instead of the whole quiz
+        progress(len(questions) / num_questions, f"Replacing {num_questions - len(questions)} missing question(s)")
+        questions, follow_up = top_up_questions(questions, text, quiz_type, num_questions, api_key,
+                                                with_explanations=with_explanations, model_name=plan.model)
+        diagnostics += follow_up
+        quiz = format_quiz(questions)
+
+    return {
+        "quiz": quiz,
+        "quiz_type": quiz_type,
+        "num_questions": num_questions,
+        "questions": [q.to_dict() for q in questions],
+        "diagnostics": [[d.line, d.message] for d in diagnostics],
+        "plan": plan.describe(),
+    }
+
+
+def _preview(quiz, quiz_type):
+    return [q.to_dict() for q in parse_quiz(quiz, quiz_type)[0]]
+
+
+def _generate_mixed(model, params, api_key, progress):
+    num_questions = params["num_questions"]
+    sections = mixed_sections(num_questions)
+    description = f"{model}: " + ", ".join(f"{count} {quiz_type}" for quiz_type, count in sections) + " (concurrent)"
+    progress(0.0, description)
+    # One request per quiz type, all in flight at once
+    text = focus_on_topics(params["text"], params.get("topics") or [])
+    questions, diagnostics = generate_mixed_quiz(text, sections, api_key,
+                                                 params.get("with_explanations", False), params.get("fresh", False),
+                                                 model_name=model, structured=params.get("structured", False))
+    return {
+        "quiz": format_quiz(questions),
+        "quiz_type": MIXED,
+        "num_questions": num_questions,
+        "questions": [q.to_dict() for q in questions],
+        "diagnostics": [[d.line, d.message] for d in diagnostics],
+        "plan": description,
+    }
+
+
+def _topics(params, api_key, progress):
+    topics = extract_topics(params["text"], api_key)
+    # Fail rather than keep an empty result, so a later submission tries again
+    if not topics:
+        raise Exception("No topics could be read from the model output")
+    return topics
+
+
+def _explain(params, api_key, progress):
+    explanations = generate_explanations(params["quiz_data"], api_key)
+    # JSON object keys are strings
+    return {str(i): explanation for i, explanation in explanations.items()}
+
+
+register_handler("generate", _generate)
+register_handler("topics", _topics)
+register_handler("explain", _explain)
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import httpx
+from langchain_groq import ChatGroq
+
+# One keep-alive HTTP pool shared by every Groq client in the process, so Streamlit
+# sessions and worker threads reuse warm TLS connections instead of opening new ones
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=120)
+
+_clients = {}
+_lock = threading.Lock()
+_stats = {"clients_created": 0, "clients_reused": 0, "http_requests": 0, "connections_opened": 0}
+_http_client = None
+# Per running event loop: id(loop) -> (loop, shared httpx.AsyncClient, clients built on that loop)
+_loops = {}
+_model_factory = None
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _trace(event_name, info):
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections_opened")
+
+
+def _on_request(request):
+    _count("http_requests")
+    # httpcore reports connection setup through the per-request trace hook
+    request.extensions["trace"] = _trace
+
+
+async def _atrace(event_name, info):
+    _trace(event_name, info)
+
+
+async def _on_async_request(request):
+    _count("http_requests")
+    request.extensions["trace"] = _atrace
+
+
+def get_http_client():
+    """Returns the process-wide keep-alive HTTP client used by all Groq clients."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=HTTP_LIMITS, event_hooks={"request": [_on_request]})
+        return _http_client
+
+
+def _loop_state():
+    # An AsyncClient's connections belong to the loop they were opened on, so each
+    # running loop gets its own client. Entries of loops closed since are dropped.
+    # Caller holds _lock.
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    for loop_id, state in list(_loops.items()):
+        if state[0].is_closed():
+            del _loops[loop_id]
+    state = _loops.get(id(loop))
+    if state is None or state[0] is not loop:
+        http_client = httpx.AsyncClient(limits=HTTP_LIMITS, event_hooks={"request": [_on_async_request]})
+        state = (loop, http_client, {})
+        _loops[id(loop)] = state
+    return state
+
+
+def get_async_http_client():
+    """Returns the keep-alive async HTTP client of the running event loop, or None outside one."""
+    with _lock:
+        state = _loop_state()
+    return state[1] if state else None
+
+
+def set_chat_model_factory(factory):
+    """
+    Overrides how chat models are built, e.g. with utils.llm_stub for local testing.
+
+    Args:
+        factory: Callable taking the get_chat_model arguments as keywords and
+            returning a chat model, or None to go back to ChatGroq
+    """
+    global _model_factory
+    with _lock:
+        _model_factory = factory
+        # Clients built by the previous factory must not be handed out again
+        _clients.clear()
+        for _, _, loop_clients in _loops.values():
+            loop_clients.clear()
+
+
+def get_chat_model(model_name, temperature, api_key, timeout=None, max_retries=0):
+    """
+    Returns a shared ChatGroq client, constructing it only on first use.
+
+    ChatGroq instances are safe to share between threads, so one client per
+    configuration is kept for the life of the process. Called inside a running
+    event loop, the client is kept per loop and its async calls go through that
+    loop's shared AsyncClient.
+
+    Args:
+        model_name: Groq model name
+        temperature: Sampling temperature
+        api_key: Groq API key
+        timeout: Per-request timeout in seconds (None for the client default)
+        max_retries: Client-level retries on transient errors; off by default because
+            utils.rate_limit schedules retries across all callers of a model
+
+    Returns:
+        ChatGroq: Shared client
+    """
+    key = (model_name, temperature, api_key, timeout, max_retries)
+    http_client = get_http_client()
+    with _lock:
+        loop_state = _loop_state()
+        clients = loop_state[2] if loop_state else _clients
+        model = clients.get(key)
+        if model is not None:
+            _stats["clients_reused"] += 1
+            return model
+        if _model_factory is not None:
+            model = _model_factory(model_name=model_name, temperature=temperature, api_key=api_key,
+                                   timeout=timeout, max_retries=max_retries)
+        else:
+            model = ChatGroq(
+                temperature=temperature,
+                groq_api_key=api_key,
+                model_name=model_name,
+                request_timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client,
+                http_async_client=loop_state[1] if loop_state else None
+            )
+        clients[key] = model
+        _stats["clients_created"] += 1
+        return model
+
+
+def client_stats():
+    """Returns client registry and HTTP connection reuse counters."""
+    with _lock:
+        stats = dict(_stats)
+        live = [state for state in _loops.values() if not state[0].is_closed()]
+        stats["clients"] = len(_clients) + sum(len(state[2]) for state in live)
+        stats["async_http_clients"] = len(live)
+    requests = stats["http_requests"]
+    stats["connection_reuse_rate"] = 1 - stats["connections_opened"] / requests if requests else 0.0
+    return stats
@@ -0,0 +1,73 @@
+import json
+import re
+import time
+import zlib
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# Simulated model latency in seconds, so concurrency limits can be exercised locally
+STUB_LATENCY = 0.0
+
+NUM_QUESTIONS = re.compile(r"generate (?:exactly )?(\d+)")
+
+
+def _num_questions(prompt):
+    match = NUM_QUESTIONS.search(prompt)
+    return int(match.group(1)) if match else 5
+
+
+def _respond(prompt):
+    # Recognizes each prompt in utils/quiz_generator by its wording
+    if "JSON array of topic names" in prompt:
+        return json.dumps(["Introduction", "Core Concepts", "Applications", "Review"])
+    if "Explain why the correct answer" in prompt:
+        return "This option matches the definition given in the syllabus."
+
+    n = _num_questions(prompt)
+    # Tagged with the prompt, so sections of one syllabus do not produce duplicate questions
+    tag = f"{zlib.crc32(prompt.encode()):08x}"[:6]
+    explain = "explanation" in prompt.lower()
+    if '"questions": [' in prompt:
+        questions = []
+        for i in range(1, n + 1):
+            if "multiple-choice" in prompt:
+                item = {"question": f"Stub question {i} [{tag}]?", "answer": "a",
+                        "options": {letter: f"Option {letter}{i}" for letter in "abcd"}}
+            elif "true/false" in prompt:
+                item = {"question": f"Stub statement {i} [{tag}].", "answer": i % 2 == 1}
+            else:
+                item = {"question": f"Stub sentence {i} [{tag}] with ____.", "answer": f"word{i}"}
+            if explain:
+                item["explanation"] = f"Stub explanation {i}."
+            questions.append(item)
+        return json.dumps({"questions": questions})
+
+    blocks = []
+    for i in range(1, n + 1):
+        if "multiple-choice" in prompt:
+            lines = [f"Q{i}. Stub question {i} [{tag}]?"] + [f"{letter}) Option {letter}{i}" for letter in "abcd"] + ["Answer: a"]
+        elif "true/false" in prompt:
+            lines = [f"Q{i}. Stub statement {i} [{tag}].", f"Answer: {'True' if i % 2 else 'False'}"]
+        else:
+            lines = [f"Q{i}. Stub sentence {i} [{tag}] with ____.", f"Answer: word{i}"]
+        if explain:
+            lines.append(f"Explanation: Stub explanation {i}.")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def _invoke(prompt_value, **kwargs):
+    if STUB_LATENCY:
+        time.sleep(STUB_LATENCY)
+    return AIMessage(content=_respond(prompt_value.to_string()))
+
+
+def stub_chat_model(**kwargs):
+    """
+    Chat model factory for utils.llm.set_chat_model_factory that never calls Groq.
+
+    The stub answers every prompt in utils/quiz_generator with well-formed,
+    deterministic output of the requested size, so the app and the HTTP API can
+    be run and load-tested locally without an API key.
+    """
+    return RunnableLambda(_invoke)
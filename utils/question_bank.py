@@ -0,0 +1,222 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import rate_limit
+from utils.db import DB_PATH, connection
+from utils.quiz_generator import generate_quiz_chunked, split_question_blocks, question_key
+from utils.retrieval import select_passages
+
+# Questions kept ready per (syllabus, topic, quiz type)
+BANK_TARGET_PER_TOPIC = 10
+
+# A fill adding fewer new questions than this (the model mostly repeated banked ones)
+# is unproductive; each unproductive fill in a row doubles the wait before the next one
+FILL_MIN_NEW = 3
+FILL_BACKOFF_SECONDS = 60
+FILL_MAX_BACKOFF_SECONDS = 24 * 3600
+
+# Bank filling runs in the background, a couple of topics at a time
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-bank")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def init_bank(db_path=DB_PATH):
+    with connection(db_path) as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            syllabus_hash TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            quiz_type TEXT NOT NULL,
+            question_key TEXT NOT NULL,
+            block TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            UNIQUE (syllabus_hash, quiz_type, question_key)
+        )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS question_bank_seen (
+            username TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            PRIMARY KEY (username, question_id),
+            FOREIGN KEY (question_id) REFERENCES question_bank (id)
+        )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_question_bank_lookup ON question_bank (syllabus_hash, quiz_type, topic)")
+        c.execute('''CREATE TABLE IF NOT EXISTS question_bank_fills (
+            syllabus_hash TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            quiz_type TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_added INTEGER NOT NULL DEFAULT 0,
+            unproductive INTEGER NOT NULL DEFAULT 0,
+            last_fill_at REAL NOT NULL,
+            PRIMARY KEY (syllabus_hash, topic, quiz_type)
+        )''')
+
+init_bank()
+
+
+def add_questions(syllabus_hash, topic, quiz_type, quiz, db_path=DB_PATH):
+    """
+    Stores the questions of a generated quiz in the bank, skipping duplicates.
+
+    Args:
+        syllabus_hash: Hash of the syllabus text the quiz was generated from
+        topic: Topic the questions cover
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        quiz: Raw quiz text
+
+    Returns:
+        int: Number of new questions stored
+    """
+    now = time.time()
+    rows = [(syllabus_hash, topic, quiz_type, question_key(block), block, now)
+            for block in split_question_blocks(quiz)]
+    with connection(db_path) as conn:
+        return conn.executemany("""INSERT OR IGNORE INTO question_bank
+                                   (syllabus_hash, topic, quiz_type, question_key, block, created_at)
+                                   VALUES (?, ?, ?, ?, ?, ?)""", rows).rowcount
+
+
+def count_unseen(syllabus_hash, quiz_type, topics, username, db_path=DB_PATH):
+    """Returns how many banked questions on the given topics the user has not seen yet."""
+    if not topics:
+        return 0
+    placeholders = ", ".join("?" * len(topics))
+    with connection(db_path) as conn:
+        return conn.execute(f"""SELECT COUNT(*) FROM question_bank q
+                                WHERE q.syllabus_hash = ? AND q.quiz_type = ? AND q.topic IN ({placeholders})
+                                AND NOT EXISTS (SELECT 1 FROM question_bank_seen s
+                                                WHERE s.username = ? AND s.question_id = q.id)""",
+                            (syllabus_hash, quiz_type, *topics, username)).fetchone()[0]
+
+
+def sample_questions(syllabus_hash, quiz_type, topics, num_questions, username, db_path=DB_PATH):
+    """
+    Draws num_questions banked questions the user has not seen, spread over the topics.
+
+    The questions are marked as seen by the user. Nothing is drawn when the bank
+    cannot supply all of them, so the caller can fall back to live generation.
+
+    Args:
+        syllabus_hash: Hash of the syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        topics: Selected topics
+        num_questions: Number of questions wanted
+        username: User taking the quiz
+
+    Returns:
+        list: Question blocks, or an empty list if the bank ran dry
+    """
+    if not topics:
+        return []
+    placeholders = ", ".join("?" * len(topics))
+    with connection(db_path) as conn:
+        c = conn.cursor()
+        c.execute(f"""SELECT q.id, q.topic, q.block FROM question_bank q
+                      WHERE q.syllabus_hash = ? AND q.quiz_type = ? AND q.topic IN ({placeholders})
+                      AND NOT EXISTS (SELECT 1 FROM question_bank_seen s
+                                      WHERE s.username = ? AND s.question_id = q.id)""",
+                  (syllabus_hash, quiz_type, *topics, username))
+        rows = c.fetchall()
+        if len(rows) < num_questions:
+            return []
+
+        # Round-robin over topics so every selected topic is represented
+        by_topic = {}
+        for row in rows:
+            by_topic.setdefault(row[1], []).append(row)
+        for topic_rows in by_topic.values():
+            random.shuffle(topic_rows)
+        picked = []
+        while len(picked) < num_questions:
+            for topic_rows in by_topic.values():
+                if topic_rows and len(picked) < num_questions:
+                    picked.append(topic_rows.pop())
+
+        c.executemany("INSERT OR IGNORE INTO question_bank_seen (username, question_id) VALUES (?, ?)",
+                      [(username, row[0]) for row in picked])
+    return [row[2] for row in picked]
+
+
+def _record_fill(syllabus_hash, topic, quiz_type, added, db_path):
+    # An unproductive fill extends the run of unproductive ones; a productive fill ends it
+    unproductive = 1 if added < FILL_MIN_NEW else 0
+    with connection(db_path) as conn:
+        conn.execute("""INSERT INTO question_bank_fills
+                        (syllabus_hash, topic, quiz_type, attempts, last_added, unproductive, last_fill_at)
+                        VALUES (?, ?, ?, 1, ?, ?, ?)
+                        ON CONFLICT (syllabus_hash, topic, quiz_type) DO UPDATE SET
+                            attempts = attempts + 1,
+                            last_added = excluded.last_added,
+                            unproductive = CASE WHEN excluded.unproductive THEN unproductive + 1 ELSE 0 END,
+                            last_fill_at = excluded.last_fill_at""",
+                     (syllabus_hash, topic, quiz_type, added, unproductive, time.time()))
+
+
+def _fill_due(unproductive, last_fill_at, now):
+    """Whether a topic whose last fills were unproductive may be filled again yet."""
+    if not unproductive:
+        return True
+    backoff = min(FILL_BACKOFF_SECONDS * 2 ** (unproductive - 1), FILL_MAX_BACKOFF_SECONDS)
+    return now >= last_fill_at + backoff
+
+
+def _fill_topic(text, syllabus_hash, topic, quiz_type, api_key, db_path):
+    added = 0
+    try:
+        # Bank fills are speculative, so they queue behind interactive requests for the model
+        with rate_limit.priority(rate_limit.BULK):
+            quiz = generate_quiz_chunked(f"{select_passages(text, [topic])}\n\nFocus on this topic: {topic}", quiz_type,
+                                         BANK_TARGET_PER_TOPIC, api_key, with_explanations=True, fresh=True)
+        added = add_questions(syllabus_hash, topic, quiz_type, quiz, db_path)
+    except Exception as e:
+        print(f"Question bank fill failed for topic '{topic}': {e}")
+    finally:
+        # A failed fill counts as unproductive too, so a broken topic is not retried on every rerun
+        _record_fill(syllabus_hash, topic, quiz_type, added, db_path)
+        with _in_flight_lock:
+            _in_flight.discard((syllabus_hash, topic, quiz_type))
+
+
+def fill_bank_async(text, syllabus_hash, topics, quiz_type, username, api_key, db_path=DB_PATH):
+    """
+    Tops up the bank in the background for every topic where the user has fewer
+    than BANK_TARGET_PER_TOPIC unseen questions.
+
+    Safe to call on every Streamlit rerun: topics already being generated or
+    already full are skipped, and a topic whose recent fills added few new
+    questions (the model keeps repeating itself) waits with exponential backoff.
+
+    Args:
+        text: Syllabus text
+        syllabus_hash: Hash of the syllabus text
+        topics: Topics to cover
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        username: User the bank should have unseen questions for
+        api_key: Groq API key
+    """
+    if not topics:
+        return
+    with connection(db_path) as conn:
+        counts = dict(conn.execute("""SELECT q.topic, COUNT(*) FROM question_bank q
+                                      WHERE q.syllabus_hash = ? AND q.quiz_type = ?
+                                      AND NOT EXISTS (SELECT 1 FROM question_bank_seen s
+                                                      WHERE s.username = ? AND s.question_id = q.id)
+                                      GROUP BY q.topic""", (syllabus_hash, quiz_type, username)).fetchall())
+        fills = {row[0]: row[1:] for row in conn.execute(
+            """SELECT topic, unproductive, last_fill_at FROM question_bank_fills
+               WHERE syllabus_hash = ? AND quiz_type = ?""", (syllabus_hash, quiz_type)).fetchall()}
+
+    now = time.time()
+    for topic in topics:
+        if counts.get(topic, 0) >= BANK_TARGET_PER_TOPIC:
+            continue
+        if topic in fills and not _fill_due(*fills[topic], now):
+            continue
+        job = (syllabus_hash, topic, quiz_type)
+        with _in_flight_lock:
+            if job in _in_flight:
+                continue
+            _in_flight.add(job)
+        _executor.submit(_fill_topic, text, syllabus_hash, topic, quiz_type, api_key, db_path)
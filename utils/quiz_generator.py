@@ -1,15 +1,148 @@
 
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from utils import rate_limit
+from utils.cache import PersistentCache, content_hash
+from utils.chunking import split_text, split_even, allocate
+from utils.llm import get_chat_model
+from utils.tokens import (estimate_tokens, estimate_output_tokens, max_input_tokens, plan_request,
+                          trim_to_tokens)
+from utils.quiz_parser import QUIZ_TYPES, Diagnostic, decode_json_output, parse_json_questions, parse_quiz
+from utils.retrieval import select_passages
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import re
 
-def generate_quiz(text, quiz_type, num_questions, api_key):
-    model = ChatGroq(
-        temperature=0.2,  # Lowered for stricter instruction following
-        groq_api_key=api_key,
-        model_name="llama3-70b-8192"
-    )
-    
+# Syllabus tokens sent per prompt; leaves room in an 8k context for the
+# instructions and up to 20 generated questions
+MAX_CHUNK_TOKENS = 4000
+
+# Fan-out: a quiz is decoded as parallel requests of about this many questions,
+# at most MAX_FANOUT at once
+FANOUT_QUESTIONS = 5
+MAX_FANOUT = 4
+
+# Appended to the syllabus of each fan-out request when the syllabus is too short
+# to split, so the parallel requests draw on different parts of it
+FANOUT_HINT = """
+
+This is part {part} of {parts} of a longer quiz. Read the syllabus above as {parts} consecutive parts of
+about equal length and take every question from part {part}."""
+
+QUESTION_START = re.compile(r"^\s*Q\d+\.")
+
+QUIZ_MODEL = "llama3-70b-8192"
+QUIZ_TEMPERATURE = 0.2  # Lowered for stricter instruction following
+
+def limited(chain, model_name, output_tokens, level=None, max_attempts=rate_limit.MAX_ATTEMPTS):
+    """
+    Wraps a prompt | model chain so every call goes through utils.rate_limit.
+
+    Each call (including every element of a batch) waits for the model's
+    request and token budget, and 429s and transient errors are retried with
+    jittered backoff instead of failing straight away.
+
+    Args:
+        chain: Chain whose first step is a PromptTemplate
+        model_name: Model the chain calls
+        output_tokens: Expected completion tokens per call
+        level: Priority class (defaults to the caller's rate_limit.priority scope)
+        max_attempts: Attempts per call before its last error is raised
+
+    Returns:
+        Runnable: Chain with the same inputs and outputs
+    """
+    level = rate_limit.current_priority() if level is None else level
+
+    def tokens(inputs):
+        return estimate_tokens(chain.first.format(**inputs)) + output_tokens
+
+    def invoke(inputs):
+        return rate_limit.call(lambda: chain.invoke(inputs), model_name, tokens(inputs), level, max_attempts)
+
+    async def ainvoke(inputs):
+        return await rate_limit.acall(lambda: chain.ainvoke(inputs), model_name, tokens(inputs), level,
+                                      max_attempts)
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+# Generated quizzes keyed on (model, temperature, rendered prompt hash). Students of the
+# same class routinely send identical requests, so these are shared across sessions.
+_response_cache = PersistentCache("quiz_responses", ttl_seconds=3 * 24 * 3600,
+                                  max_entries=1000, max_bytes=50 * 1024 * 1024)
+
+# Bump whenever TOPICS_PROMPT changes so stale cached topics are not reused
+TOPICS_PROMPT_VERSION = 1
+TOPICS_PROMPT = """
+Analyze the following syllabus content and extract 5-7 main topics suitable for quiz generation.
+Return ONLY a JSON array of topic names without any additional text.
+
+Syllabus Content:
+{text}
+"""
+
+# Completion size of a JSON list of 5-7 topic names
+TOPICS_OUTPUT_TOKENS = 150
+
+# Topics for a syllabus are shared across sessions and restarts for a week
+_topic_cache = PersistentCache("topics", ttl_seconds=7 * 24 * 3600)
+
+def extract_topics(text, api_key, model_name="llama3-70b-8192"):
+    """
+    Extracts the main quiz topics from syllabus text, reusing cached results.
+
+    Args:
+        text: Syllabus text
+        api_key: Groq API key
+        model_name: Groq model used for the extraction
+
+    Returns:
+        list: Topic names (empty if the model output could not be parsed)
+    """
+    key = f"{content_hash(text)}:{model_name}:v{TOPICS_PROMPT_VERSION}"
+    topics = _topic_cache.get(key)
+    if topics is not None:
+        return topics
+
+    # A syllabus too long for any model is cut down; the topics are usually laid out early
+    plan = plan_request(model_name, estimate_tokens(TOPICS_PROMPT + text), TOPICS_OUTPUT_TOKENS)
+    if plan.action == "chunk":
+        text = trim_to_tokens(text, max_input_tokens(plan.model, TOPICS_OUTPUT_TOKENS) - estimate_tokens(TOPICS_PROMPT))
+    print(f"Topic extraction: {plan.describe()}")
+
+    model = get_chat_model(plan.model, 0.5, api_key)
+    prompt = PromptTemplate.from_template(TOPICS_PROMPT)
+    chain = prompt | model | StrOutputParser()
+    # Topic suggestions yield to quiz generation when the model is busy
+    topics_json = limited(chain, plan.model, TOPICS_OUTPUT_TOKENS, level=rate_limit.BACKGROUND).invoke({"text": text})
+
+    # Replies often wrap the array in a code fence or a sentence of prose
+    topics = decode_json_output(topics_json)
+    if not isinstance(topics, list):
+        return []
+    topics = [topic.strip() for topic in topics if isinstance(topic, str) and topic.strip()]
+    if not topics:
+        return []
+    _topic_cache.set(key, topics)
+    return topics
+
+# Extra format line asked for when explanations are generated inline with the quiz
+EXPLANATION_LINE = """
+        Explanation: [One concise sentence explaining why the answer is correct]"""
+
+def build_quiz_prompt(quiz_type, with_explanations=False):
+    """
+    Builds the generation prompt for a quiz type.
+
+    Args:
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        with_explanations: Ask for an Explanation line after every answer
+
+    Returns:
+        PromptTemplate: Prompt expecting 'text' and 'num_questions'
+    """
     if quiz_type == "MCQ":
         prompt_template = """
         Using the following syllabus content, generate {num_questions} multiple-choice questions (MCQs) with 4 options each (a, b, c, d) and specify the correct answer.
@@ -20,7 +153,7 @@ def generate_quiz(text, quiz_type, num_questions, api_key):
         b) [Option 2]
         c) [Option 3]
         d) [Option 4]
-        Answer: [Correct option letter]
+        Answer: [Correct option letter]{explanation_line}
         
         Syllabus Content:
         {text}
@@ -31,7 +164,7 @@ def generate_quiz(text, quiz_type, num_questions, api_key):
         Each question should be relevant to the content and formatted as follows:
         
         Q1. [Statement]
-        Answer: [True/False]
+        Answer: [True/False]{explanation_line}
         
         Syllabus Content:
         {text}
@@ -42,7 +175,7 @@ def generate_quiz(text, quiz_type, num_questions, api_key):
         Each question should be relevant to the content and formatted as follows:
         
         Q[number]. [Sentence with ____ for the blank]
-        Answer: [Correct word/phrase]
+        Answer: [Correct word/phrase]{explanation_line}
         
         Where [number] is the question number starting from 1 up to {num_questions}.
         Ensure that all {num_questions} questions are generated and included in the output.
@@ -54,15 +187,679 @@ def generate_quiz(text, quiz_type, num_questions, api_key):
         raise ValueError("Unsupported quiz type")
     
     prompt = PromptTemplate.from_template(prompt_template)
+    return prompt.partial(explanation_line=EXPLANATION_LINE if with_explanations else "")
+
+def build_quiz_chain(quiz_type, api_key, with_explanations=False, model_name=QUIZ_MODEL):
+    model = get_chat_model(model_name, QUIZ_TEMPERATURE, api_key)
+    prompt = build_quiz_prompt(quiz_type, with_explanations)
+    return prompt | model | StrOutputParser()
+
+def response_cache_key(rendered_prompt, model_name=QUIZ_MODEL):
+    return f"{model_name}:{QUIZ_TEMPERATURE}:{content_hash(rendered_prompt)}"
+
+def plan_quiz_request(text, quiz_type, num_questions, with_explanations=False, model_name=QUIZ_MODEL):
+    """
+    Pre-flights a quiz request against the context windows of the models.
+
+    Args:
+        text: Syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        num_questions: Number of questions
+        with_explanations: Whether inline explanations are asked for
+        model_name: Preferred Groq model
+
+    Returns:
+        tokens.TokenPlan: Model to use and the estimated input and output tokens;
+            action 'chunk' means the syllabus has to be split or trimmed
+    """
+    rendered = build_quiz_prompt(quiz_type, with_explanations).format(text=text, num_questions=num_questions)
+    output_tokens = estimate_output_tokens(quiz_type, num_questions, with_explanations)
+    return plan_request(model_name, estimate_tokens(rendered), output_tokens)
+
+def fit_text(text, plan):
+    """Trims the syllabus so a request planned as 'chunk' fits its model after all."""
+    if plan.action != "chunk":
+        return text
+    overhead = plan.input_tokens - estimate_tokens(text)
+    return trim_to_tokens(text, max_input_tokens(plan.model, plan.output_tokens) - overhead)
+
+def quiz_cache_stats():
+    """Returns size and hit-rate counters of the quiz response cache."""
+    return _response_cache.stats()
+
+def generate_quiz(text, quiz_type, num_questions, api_key, with_explanations=False, fresh=False,
+                  model_name=QUIZ_MODEL, fanout=False):
+    plan = plan_quiz_request(text, quiz_type, num_questions, with_explanations, model_name)
+    print(f"Quiz request: {plan.describe()}")
+    if plan.action == "chunk" and estimate_tokens(text) > MAX_CHUNK_TOKENS:
+        # Too large for any model's context: generate per section instead
+        return generate_quiz_chunked(text, quiz_type, num_questions, api_key, with_explanations,
+                                     fresh=fresh, model_name=plan.model)
+    text = fit_text(text, plan)
+    if fanout and fanout_factor(num_questions) > 1:
+        # Decode the quiz as several smaller requests in parallel
+        return generate_quiz_fanout(text, quiz_type, num_questions, api_key, with_explanations,
+                                    fresh=fresh, model_name=plan.model)
+
+    chain = build_quiz_chain(quiz_type, api_key, with_explanations, plan.model)
+    rendered = chain.first.format(text=text, num_questions=num_questions)
     # Debug: Print the prompt to verify
-    print(prompt.format(text=text, num_questions=num_questions))
-    chain = prompt | model | StrOutputParser()
+    print(rendered)
+
+    # Identical requests (same syllabus, type, count, model) are served from the cache
+    # unless a fresh quiz is asked for; a fresh quiz replaces the cached one
+    key = response_cache_key(rendered, plan.model)
+    if not fresh:
+        quiz = _response_cache.get(key)
+        if quiz is not None:
+            return quiz
     
     try:
-        quiz = chain.invoke({
+        quiz = limited(chain, plan.model, plan.output_tokens).invoke({
             "text": text,
             "num_questions": num_questions
         })
-        return quiz
     except Exception as e:
-        raise Exception(f"Error generating quiz: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error generating quiz: {str(e)}")
+    _response_cache.set(key, quiz)
+    return quiz
+
+# Structured (JSON mode) generation. Each quiz type describes the fields of one
+# question; braces are doubled because these end up in a PromptTemplate.
+STRUCTURED_FIELDS = {
+    "MCQ": '''"question": "<question text>",
+            "options": {{"a": "<option>", "b": "<option>", "c": "<option>", "d": "<option>"}},
+            "answer": "<correct option letter>"''',
+    "True/False": '''"question": "<statement>",
+            "answer": true or false''',
+    "Fill-in-the-Blank": '''"question": "<sentence with ____ for the blank>",
+            "answer": "<correct word/phrase>"''',
+}
+STRUCTURED_EXPLANATION_FIELD = ''',
+            "explanation": "<one concise sentence explaining why the answer is correct>"'''
+
+STRUCTURED_PROMPT = """
+        Using the following syllabus content, generate exactly {{num_questions}} {description}.
+        Return ONLY a JSON object of this form, without any additional text:
+
+        {{{{"questions": [
+            {{{{{fields}}}}}
+        ]}}}}
+        {{avoid}}
+        Syllabus Content:
+        {{text}}
+        """
+
+STRUCTURED_DESCRIPTIONS = {
+    "MCQ": "multiple-choice questions (MCQs) with 4 options each (a, b, c, d)",
+    "True/False": "true/false questions",
+    "Fill-in-the-Blank": "fill-in-the-blank questions",
+}
+
+# Added to follow-up requests so replacements do not repeat the questions already kept
+AVOID_QUESTIONS = """
+        Do not repeat any of these questions:
+{questions}
+"""
+
+# Follow-up requests made for missing or invalid questions before giving up
+MAX_FOLLOWUPS = 2
+
+def build_structured_chain(quiz_type, api_key, with_explanations=False, model_name=QUIZ_MODEL):
+    """
+    Builds a chain that asks for the quiz as JSON, in the model's JSON mode.
+
+    Args:
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        api_key: Groq API key
+        with_explanations: Ask for an explanation field on every question
+        model_name: Groq model
+
+    Returns:
+        Runnable: Chain expecting 'text', 'num_questions' and 'avoid'
+    """
+    if quiz_type not in STRUCTURED_FIELDS:
+        raise ValueError("Unsupported quiz type")
+    fields = STRUCTURED_FIELDS[quiz_type] + (STRUCTURED_EXPLANATION_FIELD if with_explanations else "")
+    prompt = PromptTemplate.from_template(
+        STRUCTURED_PROMPT.format(description=STRUCTURED_DESCRIPTIONS[quiz_type], fields=fields))
+    model = get_chat_model(model_name, QUIZ_TEMPERATURE, api_key).bind(response_format={"type": "json_object"})
+    return prompt | model | StrOutputParser()
+
+def top_up_questions(questions, text, quiz_type, num_questions, api_key, with_explanations=False,
+                     max_followups=MAX_FOLLOWUPS, model_name=QUIZ_MODEL):
+    """
+    Re-requests only the questions a quiz is short of, instead of the whole quiz.
+
+    Each follow-up asks for the missing count as JSON, lists the questions
+    already kept so they are not repeated, and keeps the replacements that pass
+    schema validation.
+
+    Args:
+        questions: Valid quiz_parser.Question objects kept so far
+        text: Syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        num_questions: Number of questions wanted in total
+        api_key: Groq API key
+        with_explanations: Ask for an explanation on every question
+        max_followups: Maximum number of follow-up requests
+        model_name: Groq model
+
+    Returns:
+        tuple: (questions renumbered from 1, list of Diagnostic for rejected replacements)
+    """
+    questions = list(questions[:num_questions])
+    diagnostics = []
+    seen = {question_key(q.question) for q in questions}
+    for _ in range(max_followups):
+        missing = num_questions - len(questions)
+        if missing <= 0:
+            break
+        avoid = AVOID_QUESTIONS.format(questions="\n".join(f"        - {q.question}" for q in questions)) if questions else ""
+        # Pre-flight like the first request: a syllabus that needed chunking is trimmed to fit
+        chain = build_structured_chain(quiz_type, api_key, with_explanations, model_name)
+        overhead = estimate_tokens(chain.first.format(text="", num_questions=missing, avoid=avoid))
+        plan = plan_request(model_name, overhead + estimate_tokens(text),
+                            estimate_output_tokens(quiz_type, missing, with_explanations))
+        if plan.model != model_name:
+            chain = build_structured_chain(quiz_type, api_key, with_explanations, plan.model)
+        inputs = {"text": fit_text(text, plan), "num_questions": missing, "avoid": avoid}
+        try:
+            output = limited(chain, plan.model, plan.output_tokens).invoke(inputs)
+        except Exception as e:
+            diagnostics.append(Diagnostic(0, f"follow-up request failed: {e}"))
+            break
+        replacements, problems = parse_json_questions(output, quiz_type)
+        diagnostics.extend(problems)
+        for question in replacements:
+            key = question_key(question.question)
+            if key in seen or len(questions) >= num_questions:
+                continue
+            seen.add(key)
+            questions.append(question)
+
+    for number, question in enumerate(questions, 1):
+        question.number = number
+    return questions, diagnostics
+
+def generate_quiz_structured(text, quiz_type, num_questions, api_key, with_explanations=False, fresh=False,
+                             max_followups=MAX_FOLLOWUPS, model_name=QUIZ_MODEL):
+    """
+    Generates a quiz as JSON and validates every question against its schema.
+
+    Invalid or missing questions are re-requested with top_up_questions, so a
+    quiz with a couple of bad items costs one small follow-up call rather than
+    a full retry. The first response is cached like generate_quiz's, and the
+    request is pre-flighted the same way: a syllabus too large for the model
+    moves to a larger-context model or is trimmed.
+
+    Args:
+        text: Syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        num_questions: Number of questions
+        api_key: Groq API key
+        with_explanations: Ask for an explanation on every question
+        fresh: Bypass the response cache
+        max_followups: Maximum number of follow-up requests
+        model_name: Groq model
+
+    Returns:
+        tuple: (list of quiz_parser.Question, list of Diagnostic)
+    """
+    chain = build_structured_chain(quiz_type, api_key, with_explanations, model_name)
+    output_tokens = estimate_output_tokens(quiz_type, num_questions, with_explanations)
+    overhead = estimate_tokens(chain.first.format(text="", num_questions=num_questions, avoid=""))
+    plan = plan_request(model_name, overhead + estimate_tokens(text), output_tokens)
+    print(f"Structured quiz request: {plan.describe()}")
+    if plan.model != model_name:
+        model_name = plan.model
+        chain = build_structured_chain(quiz_type, api_key, with_explanations, model_name)
+    text = fit_text(text, plan)
+
+    inputs = {"text": text, "num_questions": num_questions, "avoid": ""}
+    key = response_cache_key(chain.first.format(**inputs), model_name)
+    output = None if fresh else _response_cache.get(key)
+    if output is None:
+        try:
+            output = limited(chain, model_name, output_tokens).invoke(inputs)
+        except Exception as e:
+            raise Exception(f"Error generating quiz: {str(e)}")
+        _response_cache.set(key, output)
+
+    questions, diagnostics = parse_json_questions(output, quiz_type)
+    unique = []
+    seen = set()
+    for question in questions:
+        if question_key(question.question) not in seen:
+            seen.add(question_key(question.question))
+            unique.append(question)
+    questions, problems = top_up_questions(unique, text, quiz_type, num_questions, api_key,
+                                           with_explanations, max_followups, model_name)
+    return questions, diagnostics + problems
+
+def stream_quiz(text, quiz_type, num_questions, api_key, with_explanations=False, fresh=False,
+                model_name=QUIZ_MODEL):
+    """
+    Streaming variant of generate_quiz that yields the completion as it arrives.
+
+    Feed the chunks to a quiz_parser.QuizParser to get each question as soon as it is
+    complete instead of waiting for the whole quiz. A cached response is
+    yielded as a single chunk. A syllabus too large for any model is trimmed
+    to fit, since a stream is a single request.
+
+    Yields:
+        str: Raw text chunks of the generated quiz
+    """
+    plan = plan_quiz_request(text, quiz_type, num_questions, with_explanations, model_name)
+    print(f"Quiz request: {plan.describe()}")
+    text = fit_text(text, plan)
+    chain = build_quiz_chain(quiz_type, api_key, with_explanations, plan.model)
+    key = response_cache_key(chain.first.format(text=text, num_questions=num_questions), plan.model)
+    if not fresh:
+        quiz = _response_cache.get(key)
+        if quiz is not None:
+            yield quiz
+            return
+
+    inputs = {"text": text, "num_questions": num_questions}
+    chunks = []
+    try:
+        for chunk in rate_limit.stream(lambda: chain.stream(inputs), plan.model,
+                                       plan.input_tokens + plan.output_tokens):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Error generating quiz: {str(e)}")
+    _response_cache.set(key, "".join(chunks))
+
+def split_question_blocks(quiz):
+    """
+    Splits raw quiz output of any quiz type into one text block per question.
+
+    Args:
+        quiz: Raw model output
+
+    Returns:
+        list: Question blocks, each starting with its 'Q<n>.' line
+    """
+    blocks = []
+    current = []
+    for line in quiz.splitlines():
+        if QUESTION_START.match(line):
+            if current:
+                blocks.append("\n".join(current).strip())
+            current = [line.strip()]
+        elif current:
+            current.append(line.strip())
+    if current:
+        blocks.append("\n".join(current).strip())
+    return blocks
+
+def question_key(block):
+    """Normalized question text of a block, used to spot duplicate questions."""
+    first_line = QUESTION_START.sub("", block.split("\n", 1)[0])
+    return re.sub(r"[^a-z0-9]+", " ", first_line.lower()).strip()
+
+def merge_question_blocks(blocks, limit=None):
+    """
+    Deduplicates question blocks on their question text and renumbers them Q1..Qn.
+
+    Args:
+        blocks: Question blocks from split_question_blocks
+        limit: Maximum number of questions to keep
+
+    Returns:
+        str: Merged quiz text
+    """
+    seen = set()
+    merged = []
+    for block in blocks:
+        key = question_key(block)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(QUESTION_START.sub(f"Q{len(merged) + 1}.", block, count=1))
+        if limit is not None and len(merged) >= limit:
+            break
+    return "\n\n".join(merged)
+
+def generate_quiz_chunked(text, quiz_type, num_questions, api_key, with_explanations=False,
+                          max_chunk_tokens=MAX_CHUNK_TOKENS, max_workers=4, fresh=False, model_name=QUIZ_MODEL,
+                          on_progress=None):
+    """
+    Map-reduce quiz generation for syllabi that do not fit in one prompt.
+
+    The text is split into token-bounded sections, num_questions is allocated
+    across sections in proportion to their length, sections are generated in
+    parallel and the results are deduplicated and renumbered.
+
+    Args:
+        text: Syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        num_questions: Total number of questions
+        api_key: Groq API key
+        with_explanations: Ask for inline explanations
+        max_chunk_tokens: Token budget of the syllabus text in each prompt
+        max_workers: Maximum number of sections generated at once
+        fresh: Bypass the response cache
+        model_name: Groq model
+        on_progress: Called with (sections done, sections sent, merged quiz text of the
+            sections finished so far) as each section finishes
+
+    Returns:
+        str: Merged quiz text
+    """
+    chunks = split_text(text, max_chunk_tokens)
+    if len(chunks) <= 1:
+        return generate_quiz(text, quiz_type, num_questions, api_key, with_explanations, fresh,
+                             model_name=model_name)
+
+    shares = allocate(num_questions, [len(chunk) for chunk in chunks])
+    inputs = [{"text": chunk, "num_questions": share} for chunk, share in zip(chunks, shares) if share]
+    print(f"Chunked quiz request: {len(inputs)} sections of up to ~{max_chunk_tokens} tokens on {model_name}")
+    return _generate_parts(inputs, quiz_type, num_questions, api_key, with_explanations, max_workers, fresh,
+                           model_name, on_progress)
+
+def fanout_factor(num_questions, max_fanout=MAX_FANOUT):
+    """Returns how many parallel requests a quiz of num_questions is split into."""
+    return max(1, min(max_fanout, math.ceil(num_questions / FANOUT_QUESTIONS)))
+
+def generate_quiz_fanout(text, quiz_type, num_questions, api_key, with_explanations=False, topics=None,
+                         max_fanout=MAX_FANOUT, fresh=False, model_name=QUIZ_MODEL, on_progress=None):
+    """
+    Generates a quiz as several smaller requests decoded in parallel.
+
+    A single completion spends most of its time decoding output tokens one
+    after another, so splitting a 20-question quiz into four 5-question
+    requests cuts wall-clock time roughly fourfold, as far as the model's rate
+    limit allows. Each request covers a disjoint slice of the syllabus: a
+    share of the topics when topics are given, otherwise a section of the
+    text, or a numbered part of it when the text is too short to split. The
+    results are deduplicated and renumbered.
+
+    Args:
+        text: Syllabus text
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        num_questions: Total number of questions
+        api_key: Groq API key
+        with_explanations: Ask for inline explanations
+        topics: Topics to divide between the requests
+        max_fanout: Maximum number of parallel requests
+        fresh: Bypass the response cache
+        model_name: Groq model
+        on_progress: Called with (requests done, requests sent, merged quiz text of the
+            requests finished so far) as each request finishes
+
+    Returns:
+        str: Merged quiz text
+    """
+    parts = fanout_factor(num_questions, max_fanout)
+    if topics:
+        parts = min(parts, len(topics))
+    if parts <= 1:
+        return generate_quiz(focus_on_topics(text, topics), quiz_type, num_questions, api_key, with_explanations,
+                             fresh, model_name=model_name)
+
+    if topics:
+        slices = [topics[i::parts] for i in range(parts)]
+        texts = [focus_on_topics(select_passages(text, topic_slice), topic_slice) for topic_slice in slices]
+        weights = [len(topic_slice) for topic_slice in slices]
+    else:
+        texts = split_even(text, parts)
+        weights = [len(section) for section in texts]
+        if len(texts) < 2:
+            texts = [text + FANOUT_HINT.format(part=part, parts=parts) for part in range(1, parts + 1)]
+            weights = [1] * parts
+
+    shares = allocate(num_questions, weights)
+    inputs = [{"text": part, "num_questions": share} for part, share in zip(texts, shares) if share]
+    print(f"Fan-out quiz request: {len(inputs)} parallel requests on {model_name}")
+    return _generate_parts(inputs, quiz_type, num_questions, api_key, with_explanations, max_fanout, fresh,
+                           model_name, on_progress)
+
+def _generate_parts(inputs, quiz_type, num_questions, api_key, with_explanations, max_workers, fresh, model_name,
+                    on_progress=None):
+    # Generates each part in parallel, then deduplicates and renumbers the questions of all parts
+    chain = build_quiz_chain(quiz_type, api_key, with_explanations, model_name)
+
+    # Parts already generated for an identical prompt are not sent again
+    keys = [response_cache_key(chain.first.format(**item), model_name) for item in inputs]
+    results = [None if fresh else _response_cache.get(key) for key in keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        output_tokens = estimate_output_tokens(quiz_type, max(item["num_questions"] for item in inputs),
+                                               with_explanations)
+        generated = limited(chain, model_name, output_tokens).batch_as_completed(
+            [inputs[i] for i in pending], config={"max_concurrency": max_workers}, return_exceptions=True)
+        for done, (j, result) in enumerate(generated, 1):
+            i = pending[j]
+            results[i] = result
+            if not isinstance(result, Exception):
+                _response_cache.set(keys[i], result)
+            if on_progress:
+                on_progress(done, len(pending), _merge_parts(results, num_questions)[0])
+
+    quiz, errors = _merge_parts(results, num_questions)
+    if not quiz and errors:
+        raise Exception(f"Error generating quiz: {str(errors[0])}")
+    return quiz
+
+def _merge_parts(results, num_questions):
+    # Merged quiz text of the parts generated so far, and the errors of the ones that failed
+    blocks = []
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+        elif result is not None:
+            blocks.extend(split_question_blocks(result))
+    return merge_question_blocks(blocks, limit=num_questions) if blocks else "", errors
+
+def focus_on_topics(text, topics):
+    """Appends the instruction to focus on the given topics to a syllabus text (unchanged without topics)."""
+    return text + f"\n\nFocus on these topics: {', '.join(topics)}" if topics else text
+
+async def astream_quiz(text, quiz_type, num_questions, api_key, with_explanations=False, model_name=QUIZ_MODEL,
+                       fresh=False):
+    """Async counterpart of stream_quiz built on chain.astream, sharing its response cache."""
+    plan = plan_quiz_request(text, quiz_type, num_questions, with_explanations, model_name)
+    text = fit_text(text, plan)
+    chain = build_quiz_chain(quiz_type, api_key, with_explanations, plan.model)
+    key = response_cache_key(chain.first.format(text=text, num_questions=num_questions), plan.model)
+    if not fresh:
+        # The cache is SQLite; keep its reads and writes off the event loop
+        quiz = await asyncio.to_thread(_response_cache.get, key)
+        if quiz is not None:
+            yield quiz
+            return
+
+    inputs = {"text": text, "num_questions": num_questions}
+    chunks = []
+    try:
+        async for chunk in rate_limit.astream(lambda: chain.astream(inputs), plan.model,
+                                              plan.input_tokens + plan.output_tokens):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Error generating quiz: {str(e)}")
+    await asyncio.to_thread(_response_cache.set, key, "".join(chunks))
+
+async def agenerate_quiz(text, quiz_type, num_questions, api_key, with_explanations=False, fresh=False,
+                         model_name=QUIZ_MODEL):
+    """
+    Async counterpart of generate_quiz built on chain.ainvoke, sharing its response cache.
+
+    Several of these can run concurrently on one event loop, e.g. one per quiz
+    type with asyncio.gather (see agenerate_mixed_quiz).
+
+    Returns:
+        str: Generated quiz text
+    """
+    plan = plan_quiz_request(text, quiz_type, num_questions, with_explanations, model_name)
+    if plan.action == "chunk" and estimate_tokens(text) > MAX_CHUNK_TOKENS:
+        # Map-reduce over sections runs its own thread pool
+        return await asyncio.to_thread(generate_quiz_chunked, text, quiz_type, num_questions, api_key,
+                                       with_explanations, fresh=fresh, model_name=plan.model)
+    text = fit_text(text, plan)
+    chain = build_quiz_chain(quiz_type, api_key, with_explanations, plan.model)
+    inputs = {"text": text, "num_questions": num_questions}
+    key = response_cache_key(chain.first.format(**inputs), plan.model)
+    if not fresh:
+        quiz = await asyncio.to_thread(_response_cache.get, key)
+        if quiz is not None:
+            return quiz
+
+    try:
+        quiz = await limited(chain, plan.model, plan.output_tokens).ainvoke(inputs)
+    except Exception as e:
+        raise Exception(f"Error generating quiz: {str(e)}")
+    await asyncio.to_thread(_response_cache.set, key, quiz)
+    return quiz
+
+def mixed_sections(num_questions, quiz_types=QUIZ_TYPES):
+    """Splits num_questions as evenly as possible across quiz types, as (quiz_type, count) pairs."""
+    shares = allocate(num_questions, [1] * len(quiz_types))
+    return [(quiz_type, share) for quiz_type, share in zip(quiz_types, shares) if share]
+
+async def agenerate_mixed_quiz(text, sections, api_key, with_explanations=False, fresh=False, model_name=QUIZ_MODEL):
+    """
+    Generates a quiz mixing several quiz types, one concurrent request per section.
+
+    Sections are generated with asyncio.gather, so a mixed quiz takes about as
+    long as its slowest section instead of one round trip per quiz type.
+    Sections that come back short are topped up like single-type quizzes.
+
+    Args:
+        text: Syllabus text
+        sections: (quiz_type, num_questions) pairs, in the order they appear in the quiz
+        api_key: Groq API key
+        with_explanations: Ask for inline explanations
+        fresh: Bypass the response cache
+        model_name: Groq model
+
+    Returns:
+        tuple: (questions of all sections renumbered from 1, list of Diagnostic)
+    """
+    async def section(quiz_type, num_questions):
+        quiz = await agenerate_quiz(text, quiz_type, num_questions, api_key, with_explanations, fresh, model_name)
+        questions, diagnostics = parse_quiz(quiz, quiz_type)
+        if len(questions) < num_questions:
+            questions, follow_up = await asyncio.to_thread(top_up_questions, questions, text, quiz_type,
+                                                           num_questions, api_key, with_explanations,
+                                                           model_name=model_name)
+            diagnostics += follow_up
+        return questions, diagnostics
+
+    results = await asyncio.gather(*(section(quiz_type, count) for quiz_type, count in sections))
+    return _merge_sections(results)
+
+def generate_mixed_quiz(text, sections, api_key, with_explanations=False, fresh=False, model_name=QUIZ_MODEL,
+                        structured=False):
+    """
+    Sync counterpart of agenerate_mixed_quiz, generating the sections on a thread pool.
+
+    For callers without an event loop of their own (background jobs): the
+    shared chat models are bound to whichever loop first used them
+    asynchronously, so a fresh asyncio.run per call cannot reuse them. With
+    structured, each section is generated by generate_quiz_structured.
+    """
+    def section(quiz_type, num_questions):
+        if structured:
+            return generate_quiz_structured(text, quiz_type, num_questions, api_key, with_explanations, fresh,
+                                            model_name=model_name)
+        quiz = generate_quiz(text, quiz_type, num_questions, api_key, with_explanations, fresh,
+                             model_name=model_name)
+        questions, diagnostics = parse_quiz(quiz, quiz_type)
+        if len(questions) < num_questions:
+            questions, follow_up = top_up_questions(questions, text, quiz_type, num_questions, api_key,
+                                                    with_explanations, model_name=model_name)
+            diagnostics += follow_up
+        return questions, diagnostics
+
+    with ThreadPoolExecutor(max_workers=len(sections) or 1) as executor:
+        futures = [executor.submit(section, quiz_type, count) for quiz_type, count in sections]
+        return _merge_sections([future.result() for future in futures])
+
+def _merge_sections(results):
+    # Concatenates (questions, diagnostics) of each section, renumbering the questions from 1
+    questions = [question for section_questions, _ in results for question in section_questions]
+    diagnostics = [diagnostic for _, section_diagnostics in results for diagnostic in section_diagnostics]
+    for number, question in enumerate(questions, 1):
+        question.number = number
+    return questions, diagnostics
+
+# Completion size of a 1-2 sentence explanation
+EXPLANATION_OUTPUT_TOKENS = 80
+
+EXPLANATION_PROMPT = """
+Explain why the correct answer is {correct} for this question:
+Question: {question}
+{options}
+Provide a concise 1-2 sentence explanation.
+"""
+
+def generate_explanations(quiz_data, api_key, model_name="llama3-8b-8192", max_concurrency=8, timeout=20):
+    """
+    Generates explanations for parsed questions of any quiz type concurrently.
+
+    Questions that already carry an inline explanation (see generate_quiz's
+    with_explanations) are answered from it without an LLM call.
+
+    Args:
+        quiz_data: List of parsed questions ({"question", "options", "correct"}; options empty unless MCQ)
+        api_key: Groq API key
+        model_name: Groq model used for the explanations
+        max_concurrency: Maximum number of requests in flight at once
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        dict: Question index -> explanation, for every request that succeeded
+    """
+    explanations, missing, chain, inputs = _explanation_requests(quiz_data, api_key, model_name, timeout)
+    if missing:
+        # A failed or timed-out request only loses its own explanation
+        results = chain.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        _collect_explanations(explanations, missing, results)
+    return explanations
+
+async def agenerate_explanations(quiz_data, api_key, model_name="llama3-8b-8192", max_concurrency=8, timeout=20):
+    """Async counterpart of generate_explanations built on chain.abatch."""
+    explanations, missing, chain, inputs = _explanation_requests(quiz_data, api_key, model_name, timeout)
+    if missing:
+        results = await chain.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+        _collect_explanations(explanations, missing, results)
+    return explanations
+
+def _explanation_requests(quiz_data, api_key, model_name, timeout):
+    # Inline explanations are reused; the rest become one chain input each
+    explanations = {i: q["explanation"] for i, q in enumerate(quiz_data) if q.get("explanation")}
+    missing = [i for i in range(len(quiz_data)) if i not in explanations]
+    if not missing:
+        return explanations, missing, None, []
+
+    model = get_chat_model(model_name, 0.7, api_key, timeout=timeout)
+    prompt = PromptTemplate.from_template(EXPLANATION_PROMPT)
+    # Explanations yield to interactive quiz generation when the model is busy. They are not
+    # retried: the per-request timeout bounds the wait, and a missing one is simply skipped
+    chain = limited(prompt | model | StrOutputParser(), model_name, EXPLANATION_OUTPUT_TOKENS,
+                    level=rate_limit.BACKGROUND, max_attempts=1)
+
+    inputs = [{
+        "correct": q["correct"].capitalize() if q["correct"] in ("true", "false") else q["correct"],
+        "question": q["question"],
+        "options": _explanation_options(q.get("options")),
+    } for q in (quiz_data[i] for i in missing)]
+    return explanations, missing, chain, inputs
+
+def _explanation_options(options):
+    # Only MCQs have options to list; True/False and Fill-in-the-Blank prompts go without
+    if not options:
+        return ""
+    return "Options:\n" + "".join(f"{letter}) {options[letter]}\n" for letter in sorted(options))
+
+def _collect_explanations(explanations, missing, results):
+    for i, result in zip(missing, results):
+        if isinstance(result, Exception):
+            print(f"Explanation for question {i + 1} failed: {result}")
+            continue
+        explanations[i] = result
@@ -0,0 +1,395 @@
+import json
+import re
+from dataclasses import dataclass, field
+
+QUIZ_TYPES = ("MCQ", "True/False", "Fill-in-the-Blank")
+# A quiz combining questions of every type in QUIZ_TYPES
+MIXED = "Mixed"
+OPTION_LETTERS = ("a", "b", "c", "d")
+
+# Each line is classified by at most one of these anchored patterns; none of them
+# can backtrack across lines, so parsing stays linear in the size of the output
+QUESTION_LINE = re.compile(r"^\**\s*Q(\d+)\s*[.):]\**\s*(.*)$")
+OPTION_LINE = re.compile(r"^\**\s*\(?([a-dA-D])[).]\**\s*(.*)$")
+ANSWER_LINE = re.compile(r"^\**\s*(?:Correct\s+)?Answer\s*\**\s*:\s*\**\s*(.*?)\s*\**$", re.IGNORECASE)
+EXPLANATION_LINE = re.compile(r"^\**\s*Explanation\s*\**\s*:\s*\**\s*(.*?)\s*\**$", re.IGNORECASE)
+# A bare letter, or one followed by ')', '.' or ':'; not the article in "A cell wall"
+MCQ_ANSWER = re.compile(r"^\(?([a-d])(?:[).:]|$)", re.IGNORECASE)
+
+
+@dataclass
+class Question:
+    """A parsed quiz question. answer is the option letter, 'true'/'false', or the blank's text."""
+    number: int
+    quiz_type: str
+    question: str
+    answer: str
+    options: dict = field(default_factory=dict)
+    explanation: str = ""
+
+    def to_dict(self):
+        """Returns the record in the quiz_data shape used by the app."""
+        data = {
+            "type": self.quiz_type,
+            "question": self.question,
+            "options": dict(self.options),
+            "correct": self.answer,
+        }
+        if self.explanation:
+            data["explanation"] = self.explanation
+        return data
+
+    def to_text(self, number=None):
+        """Renders the question in the plain-text quiz format the prompts ask for."""
+        lines = [f"Q{number or self.number}. {self.question}"]
+        if self.quiz_type == "MCQ":
+            lines.extend(f"{letter}) {self.options[letter]}" for letter in OPTION_LETTERS)
+            lines.append(f"Answer: {self.answer}")
+        elif self.quiz_type == "True/False":
+            lines.append(f"Answer: {self.answer.capitalize()}")
+        else:
+            lines.append(f"Answer: {self.answer}")
+        if self.explanation:
+            lines.append(f"Explanation: {self.explanation}")
+        return "\n".join(lines)
+
+
+@dataclass
+class Diagnostic:
+    """A problem found while parsing, e.g. a question dropped for a missing option."""
+    line: int
+    message: str
+
+
+class QuizParser:
+    """
+    Single-pass, line-oriented parser for generated quizzes of any quiz type.
+
+    Works on complete outputs (parse_quiz) and on streamed output: feed()
+    buffers partial lines and returns every question completed by the chunk.
+    A question is complete once its Answer line has arrived, or, when inline
+    explanations are expected, its Explanation line. Questions that cannot be
+    completed are dropped and reported in diagnostics.
+
+    Args:
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+        expect_explanations: Wait for an Explanation line after each answer
+    """
+
+    def __init__(self, quiz_type="MCQ", expect_explanations=False):
+        if quiz_type not in QUIZ_TYPES:
+            raise ValueError("Unsupported quiz type")
+        self.quiz_type = quiz_type
+        self.expect_explanations = expect_explanations
+        self.diagnostics = []
+        self._partial = ""
+        self._line_number = 0
+        self._reset()
+
+    def _reset(self):
+        self._number = None
+        self._start_line = 0
+        self._question = []
+        self._options = {}
+        self._last_option = None
+        self._answer = None
+        self._explanation = ""
+
+    def feed(self, chunk):
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        completed = []
+        for line in lines:
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self):
+        completed = []
+        if self._partial:
+            self._feed_line(self._partial, completed)
+            self._partial = ""
+        self._finish(completed)
+        return completed
+
+    def _feed_line(self, line, completed):
+        self._line_number += 1
+        line = line.strip()
+        if not line:
+            return
+
+        # Dispatch on the first character so most lines are tried against one pattern at most
+        first = line[0]
+        match = QUESTION_LINE.match(line) if first in "Q*" else None
+        if match:
+            self._finish(completed)
+            self._number = int(match.group(1))
+            self._start_line = self._line_number
+            if match.group(2):
+                self._question.append(match.group(2))
+            return
+        if self._number is None:
+            # Preamble before the first question, or trailing text after a completed one
+            return
+
+        match = ANSWER_LINE.match(line) if first in "AaCc*" else None
+        if match:
+            self._answer = match.group(1)
+            if not self.expect_explanations:
+                self._finish(completed)
+            return
+
+        match = EXPLANATION_LINE.match(line) if first in "Ee*" else None
+        if match:
+            self._explanation = match.group(1)
+            if self._answer is not None:
+                self._finish(completed)
+            return
+
+        if self._answer is not None:
+            return
+
+        if self.quiz_type == "MCQ":
+            match = OPTION_LINE.match(line)
+            if match:
+                self._last_option = match.group(1).lower()
+                self._options[self._last_option] = match.group(2)
+                return
+            if self._last_option:
+                # Option text wrapped onto the next line
+                self._options[self._last_option] += " " + line
+                return
+        self._question.append(line)
+
+    def _finish(self, completed):
+        if self._number is None:
+            return
+        question = self._build()
+        if question is not None:
+            completed.append(question)
+        self._reset()
+
+    def _diagnose(self, message):
+        self.diagnostics.append(Diagnostic(self._start_line, f"Q{self._number}: {message}"))
+
+    def _build(self):
+        text = " ".join(self._question).strip()
+        if not text:
+            self._diagnose("missing question text")
+            return None
+        if self._answer is None:
+            self._diagnose("missing Answer line")
+            return None
+
+        answer = self._answer.strip()
+        if self.quiz_type == "MCQ":
+            missing = [letter for letter in OPTION_LETTERS if not self._options.get(letter)]
+            if missing:
+                self._diagnose(f"missing option(s) {', '.join(missing)}")
+                return None
+            answer = _mcq_answer(answer, self._options)
+            if answer is None:
+                self._diagnose(f"answer '{self._answer}' is not one of the options")
+                return None
+        elif self.quiz_type == "True/False":
+            lowered = answer.lower()
+            if lowered.startswith("true"):
+                answer = "true"
+            elif lowered.startswith("false"):
+                answer = "false"
+            else:
+                self._diagnose(f"answer '{self._answer}' is not True or False")
+                return None
+        elif not answer:
+            self._diagnose("empty answer")
+            return None
+
+        options = {letter: self._options[letter].strip() for letter in OPTION_LETTERS} if self.quiz_type == "MCQ" else {}
+        return Question(self._number, self.quiz_type, text, answer, options, self._explanation.strip())
+
+
+def _mcq_answer(answer, options):
+    # Some outputs repeat the option text instead of its letter; an exact text match
+    # wins, so an answer like "A cell wall" is not read as option a
+    by_text = {value.strip().lower(): letter for letter, value in options.items()}
+    if answer.lower() in by_text:
+        return by_text[answer.lower()]
+    match = MCQ_ANSWER.match(answer)
+    return match.group(1).lower() if match else None
+
+
+def format_quiz(questions):
+    """Renders questions as plain quiz text, renumbered from 1."""
+    return "\n\n".join(question.to_text(i) for i, question in enumerate(questions, 1))
+
+
+def _normalize_blank(answer):
+    return re.sub(r"[^a-z0-9]+", " ", answer.lower()).strip()
+
+
+def is_correct(question, answer):
+    """
+    Grades a user's answer to a question in the quiz_data shape.
+
+    MCQ and True/False answers must match exactly; Fill-in-the-Blank answers
+    are compared ignoring case, punctuation and extra whitespace.
+
+    Args:
+        question: {"type", "question", "options", "correct"} as from Question.to_dict
+        answer: Option letter, 'true'/'false', or the text typed in, None if unanswered
+
+    Returns:
+        bool: Whether the answer is correct
+    """
+    if not answer:
+        return False
+    if question.get("type") == "Fill-in-the-Blank":
+        return _normalize_blank(answer) == _normalize_blank(question["correct"])
+    return answer == question["correct"]
+
+
+def format_answer(question, answer):
+    """Renders an answer to a question in the quiz_data shape for display, e.g. 'B) Mitosis' or 'True'."""
+    if not answer:
+        return "Not answered"
+    if question.get("options"):
+        return f"{answer.upper()}) {question['options'].get(answer, '')}"
+    if question.get("type") == "True/False":
+        return answer.capitalize()
+    return answer
+
+
+def validate_question(item, quiz_type):
+    """
+    Checks one structured-output item against the schema of its quiz type.
+
+    Args:
+        item: Decoded JSON object for one question
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+
+    Returns:
+        Question: The validated question
+
+    Raises:
+        ValueError: If the item does not match the schema
+    """
+    if not isinstance(item, dict):
+        raise ValueError("item is not an object")
+    question = item.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("missing question text")
+    explanation = item.get("explanation") or ""
+    if not isinstance(explanation, str):
+        raise ValueError("explanation is not a string")
+    answer = item.get("answer")
+
+    options = {}
+    if quiz_type == "MCQ":
+        raw_options = item.get("options")
+        if isinstance(raw_options, list) and len(raw_options) == 4:
+            raw_options = dict(zip(OPTION_LETTERS, raw_options))
+        if not isinstance(raw_options, dict):
+            raise ValueError("options is not an object with keys a-d")
+        raw_options = {str(key).strip().lower().rstrip(")"): value for key, value in raw_options.items()}
+        for letter in OPTION_LETTERS:
+            value = raw_options.get(letter)
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"missing option {letter}")
+            options[letter] = value.strip()
+        if not isinstance(answer, str):
+            raise ValueError("answer is not an option letter")
+        answer = _mcq_answer(answer.strip(), options)
+        if answer is None:
+            raise ValueError("answer is not one of the options")
+    elif quiz_type == "True/False":
+        if isinstance(answer, str) and answer.strip().lower() in ("true", "false"):
+            answer = answer.strip().lower() == "true"
+        if not isinstance(answer, bool):
+            raise ValueError("answer is not true or false")
+        answer = "true" if answer else "false"
+    else:
+        if isinstance(answer, (int, float)) and not isinstance(answer, bool):
+            answer = str(answer)
+        if not isinstance(answer, str) or not answer.strip():
+            raise ValueError("missing answer")
+        answer = answer.strip()
+
+    return Question(0, quiz_type, question.strip(), answer, options, explanation.strip())
+
+
+def decode_json_output(output):
+    """
+    Decodes the JSON payload of a model reply.
+
+    Tolerates a markdown code fence around it and prose before or after a
+    JSON array, e.g. 'Here are the topics: [...]'.
+
+    Args:
+        output: Raw model output
+
+    Returns:
+        The decoded value, or None if no JSON could be found
+    """
+    text = output.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    try:
+        return json.loads(text)
+    except ValueError:
+        # Tolerate prose around the JSON payload
+        start, end = text.find("["), text.rfind("]")
+        try:
+            return json.loads(text[start:end + 1]) if 0 <= start < end else None
+        except ValueError:
+            return None
+
+
+def parse_json_questions(output, quiz_type):
+    """
+    Decodes structured (JSON) model output and validates every question in it.
+
+    Accepts a JSON array of questions or an object wrapping one under
+    "questions", optionally inside a markdown code fence.
+
+    Args:
+        output: Raw model output
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+
+    Returns:
+        tuple: (list of valid Question, list of Diagnostic for rejected items)
+    """
+    data = decode_json_output(output)
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list):
+        return [], [Diagnostic(0, "output is not a JSON list of questions")]
+
+    questions = []
+    diagnostics = []
+    for index, item in enumerate(data, 1):
+        try:
+            question = validate_question(item, quiz_type)
+        except ValueError as e:
+            diagnostics.append(Diagnostic(0, f"item {index}: {e}"))
+            continue
+        question.number = len(questions) + 1
+        questions.append(question)
+    return questions, diagnostics
+
+
+def parse_quiz(quiz, quiz_type="MCQ"):
+    """
+    Parses a complete generated quiz.
+
+    Args:
+        quiz: Raw model output
+        quiz_type: 'MCQ', 'True/False' or 'Fill-in-the-Blank'
+
+    Returns:
+        tuple: (list of Question, list of Diagnostic)
+    """
+    # The whole output is available, so a question can wait for its Explanation line
+    parser = QuizParser(quiz_type, expect_explanations=True)
+    questions = parser.feed(quiz)
+    questions.extend(parser.close())
+    return questions, parser.diagnostics
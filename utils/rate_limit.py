@@ -0,0 +1,343 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from utils import router
+
+# Priority classes: lower runs first when callers are waiting for the same model
+INTERACTIVE = 0   # quiz generation a user is waiting for
+BACKGROUND = 1    # explanations, topic extraction
+BULK = 2          # question bank fills, batch mode
+
+# (requests per minute, tokens per minute) per model, from the Groq rate limits
+MODEL_LIMITS = {
+    "llama3-70b-8192": (30, 6000),
+    "llama3-8b-8192": (30, 30000),
+    "mixtral-8x7b-32768": (30, 5000),
+}
+DEFAULT_LIMITS = (30, 6000)
+
+# Retries of rate-limited (429) and transient (5xx, timeout, connection) failures
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = ("RateLimit", "Timeout", "APIConnection", "InternalServer", "ServiceUnavailable")
+
+# How often an async caller that is not at the head of the queue checks again
+ASYNC_POLL_SECONDS = 0.05
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=INTERACTIVE)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to capacity tokens, refilled at rate per second.
+
+    Not thread-safe on its own; ModelLimiter serializes access.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are now)."""
+        self._refill(now)
+        # A request larger than the bucket would wait forever; let it through on a full bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ModelLimiter:
+    """
+    Request and token buckets for one model, shared by every thread in the process.
+
+    Callers queue by (priority, arrival); only the head of the queue may take
+    from the buckets, so an interactive request is never starved by a backlog
+    of background ones.
+
+    Args:
+        requests_per_minute: Request limit
+        tokens_per_minute: Token (prompt + completion) limit
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.paused_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "throttled": 0, "retries": 0, "failures": 0}
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """Blocks until a request of about this many tokens may be sent; returns the seconds waited."""
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = self._try_take(entry, tokens)
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._leave(entry)
+            return self._record_wait(started)
+
+    async def aacquire(self, tokens, priority=INTERACTIVE):
+        """
+        Async counterpart of acquire: waits with asyncio.sleep instead of blocking a thread.
+
+        A waiter that is cancelled leaves the queue without taking any tokens.
+        """
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(entry, tokens)
+                if wait == 0:
+                    break
+                # Sync waiters are woken through the condition; async ones check again
+                await asyncio.sleep(ASYNC_POLL_SECONDS if wait is None else wait)
+        finally:
+            with self._cond:
+                self._leave(entry)
+        with self._cond:
+            return self._record_wait(started)
+
+    def _try_take(self, entry, tokens):
+        # Takes from the buckets if entry is at the head of the queue and they allow it.
+        # Returns 0 when taken, else the seconds to wait (None: not the head). Caller holds _cond.
+        if self._waiters[0] != entry:
+            return None
+        now = time.monotonic()
+        wait = max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        return 0
+
+    def _leave(self, entry):
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self._cond.notify_all()
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        self.stats["acquired"] += 1
+        if waited > 0.01:
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += waited
+        return waited
+
+    def pause(self, seconds):
+        """Holds every caller of this model, e.g. after the provider answered 429."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats["throttled"] += 1
+            self._cond.notify_all()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model_name):
+    """Returns the process-wide limiter of a model, creating it on first use."""
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = ModelLimiter(*MODEL_LIMITS.get(model_name, DEFAULT_LIMITS))
+        return _limiters[model_name]
+
+
+def set_limits(model_name, requests_per_minute=None, tokens_per_minute=None):
+    """Overrides the limits of a model, e.g. for a paid tier or a batch run."""
+    rpm, tpm = MODEL_LIMITS.get(model_name, DEFAULT_LIMITS)
+    MODEL_LIMITS[model_name] = (requests_per_minute or rpm, tokens_per_minute or tpm)
+    with _limiters_lock:
+        _limiters.pop(model_name, None)
+
+
+@contextmanager
+def priority(level):
+    """Runs the calls made inside the with block at the given priority class."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def retry_delay(error, attempt):
+    """
+    Returns how long to wait before retrying a failed call, or None if it should not be retried.
+
+    Honours Retry-After when the provider sends one; otherwise uses exponential
+    backoff with full jitter.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status not in RETRYABLE_STATUS and not any(name in type(error).__name__ for name in RETRYABLE_NAMES):
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _is_rate_limit(error):
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def call(fn, model_name, tokens, level=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Calls fn once the model's limits allow, retrying rate-limited and transient failures.
+
+    The duration and outcome of every attempt feed utils.router's health stats.
+
+    Args:
+        fn: Zero-argument callable making one LLM request
+        model_name: Model the request goes to
+        tokens: Estimated prompt + completion tokens
+        level: Priority class (defaults to the current priority() scope)
+        max_attempts: Attempts before the last error is raised
+
+    Returns:
+        The result of fn
+    """
+    limiter = get_limiter(model_name)
+    level = current_priority() if level is None else level
+    for attempt in range(max_attempts):
+        limiter.acquire(tokens, level)
+        started = time.perf_counter()
+        try:
+            result = fn()
+            router.record(model_name, time.perf_counter() - started, True)
+            return result
+        except Exception as e:
+            router.record(model_name, time.perf_counter() - started, False)
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt == max_attempts - 1:
+                limiter.stats["failures"] += 1
+                raise
+            _back_off(limiter, e, delay)
+            time.sleep(delay)
+
+
+async def acall(fn, model_name, tokens, level=None, max_attempts=MAX_ATTEMPTS):
+    """Async counterpart of call; fn returns an awaitable."""
+    limiter = get_limiter(model_name)
+    level = current_priority() if level is None else level
+    for attempt in range(max_attempts):
+        await limiter.aacquire(tokens, level)
+        started = time.perf_counter()
+        try:
+            result = await fn()
+            router.record(model_name, time.perf_counter() - started, True)
+            return result
+        except Exception as e:
+            router.record(model_name, time.perf_counter() - started, False)
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt == max_attempts - 1:
+                limiter.stats["failures"] += 1
+                raise
+            _back_off(limiter, e, delay)
+            await asyncio.sleep(delay)
+
+
+def stream(fn, model_name, tokens, level=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Streaming counterpart of call; fn returns an iterator of chunks.
+
+    A failure is only retried before the first chunk has been yielded.
+    """
+    limiter = get_limiter(model_name)
+    level = current_priority() if level is None else level
+    for attempt in range(max_attempts):
+        limiter.acquire(tokens, level)
+        started = time.perf_counter()
+        yielded = False
+        try:
+            for chunk in fn():
+                yielded = True
+                yield chunk
+            router.record(model_name, time.perf_counter() - started, True)
+            return
+        except Exception as e:
+            router.record(model_name, time.perf_counter() - started, False)
+            delay = None if yielded else retry_delay(e, attempt)
+            if delay is None or attempt == max_attempts - 1:
+                limiter.stats["failures"] += 1
+                raise
+            _back_off(limiter, e, delay)
+            time.sleep(delay)
+
+
+async def astream(fn, model_name, tokens, level=None, max_attempts=MAX_ATTEMPTS):
+    """Async counterpart of stream; fn returns an async iterator of chunks."""
+    limiter = get_limiter(model_name)
+    level = current_priority() if level is None else level
+    for attempt in range(max_attempts):
+        await limiter.aacquire(tokens, level)
+        started = time.perf_counter()
+        yielded = False
+        try:
+            async for chunk in fn():
+                yielded = True
+                yield chunk
+            router.record(model_name, time.perf_counter() - started, True)
+            return
+        except Exception as e:
+            router.record(model_name, time.perf_counter() - started, False)
+            delay = None if yielded else retry_delay(e, attempt)
+            if delay is None or attempt == max_attempts - 1:
+                limiter.stats["failures"] += 1
+                raise
+            _back_off(limiter, e, delay)
+            await asyncio.sleep(delay)
+
+
+def _back_off(limiter, error, delay):
+    limiter.stats["retries"] += 1
+    if _is_rate_limit(error):
+        # The provider's window is full: hold every caller of the model, not just this one
+        limiter.pause(delay)
+    print(f"Retrying after {type(error).__name__} in {delay:.1f}s")
+
+
+def limiter_stats():
+    """Returns wait, throttle and retry counters per model."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: dict(limiter.stats, limits=MODEL_LIMITS.get(name, DEFAULT_LIMITS))
+            for name, limiter in limiters.items()}
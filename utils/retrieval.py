@@ -0,0 +1,141 @@
+import math
+import re
+from collections import Counter
+from utils.cache import LRUCache, content_hash
+from utils.chunking import split_text
+from utils.tokens import estimate_tokens
+
+# Size of the passages the syllabus is indexed in
+PASSAGE_TOKENS = 150
+
+# Syllabus tokens sent when topics are selected; long syllabi are cut down to the
+# passages most relevant to the topics, short ones are sent whole
+FOCUS_TOKEN_BUDGET = 2000
+
+# Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their this to was were
+will with which what when where who how these those than then there can may also such not but all any
+each other our your we you they he she i
+""".split())
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Indexes keyed on the hash of the syllabus; Streamlit reruns on every interaction
+_index_cache = LRUCache(max_entries=16, sizeof=lambda index: 1)
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords, with a plural 's' stripped."""
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over the passages of one document.
+
+    Args:
+        passages: Passage texts, in document order
+    """
+
+    def __init__(self, passages):
+        self.passages = passages
+        self._term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = sum(self._lengths) / len(passages) if passages else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        n = len(passages)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query):
+        """
+        Scores every passage against a query.
+
+        Args:
+            query: Query text
+
+        Returns:
+            list: BM25 score per passage (0 for passages sharing no term with the query)
+        """
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        scores = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length) if self._avg_length else BM25_K1
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+def get_index(text):
+    """Returns the passage index of a document, building it on first use."""
+    key = content_hash(text)
+    index = _index_cache.get(key)
+    if index is None:
+        index = BM25Index(split_text(text, PASSAGE_TOKENS))
+        _index_cache.set(key, index)
+    return index
+
+
+def select_passages(text, topics, max_tokens=FOCUS_TOKEN_BUDGET):
+    """
+    Cuts a syllabus down to the passages most relevant to the selected topics.
+
+    Passages are ranked per topic with BM25 and taken round-robin across the
+    topics, best first, so every topic is covered before any topic gets a
+    second passage. The selection is returned in document order.
+
+    Args:
+        text: Syllabus text
+        topics: Selected topics
+        max_tokens: Token budget of the selected passages
+
+    Returns:
+        str: The selected passages, or the whole text if it already fits the
+            budget or no passage matches any topic
+    """
+    if not topics or estimate_tokens(text) <= max_tokens:
+        return text
+
+    index = get_index(text)
+    rankings = []
+    for topic in topics:
+        scores = index.scores(topic)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: scores[i], reverse=True)
+        if ranked:
+            rankings.append(ranked)
+    if not rankings:
+        return text
+
+    selected = set()
+    used = 0
+    while rankings:
+        for ranked in rankings:
+            while ranked and ranked[0] in selected:
+                ranked.pop(0)
+            if not ranked:
+                continue
+            i = ranked.pop(0)
+            cost = estimate_tokens(index.passages[i])
+            if used + cost <= max_tokens:
+                selected.add(i)
+                used += cost
+        rankings = [ranked for ranked in rankings if ranked]
+    if not selected:
+        return text
+    return "\n\n".join(index.passages[i] for i in sorted(selected))
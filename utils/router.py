@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+from utils.tokens import MODEL_CONTEXT
+
+# Model choice that lets the router pick
+AUTO = "auto"
+
+# In auto mode, quizzes of up to this many questions go to the small, fast model
+SMALL_QUIZ_QUESTIONS = 5
+SMALL_QUIZ_MODEL = "llama3-8b-8192"
+LARGE_QUIZ_MODEL = "llama3-70b-8192"
+
+# Rolling window of calls each model's health is judged on
+WINDOW_SIZE = 50
+WINDOW_SECONDS = 15 * 60
+# A model is degraded once it has enough recent calls and fails or stalls too often
+MIN_SAMPLES = 3
+MAX_ERROR_RATE = 0.5
+MAX_P95_SECONDS = 30.0
+
+_samples = {}
+_lock = threading.Lock()
+
+
+def record(model_name, seconds, ok):
+    """
+    Records the outcome of one LLM call.
+
+    Args:
+        model_name: Model that was called
+        seconds: How long the call took
+        ok: False if it raised
+    """
+    with _lock:
+        samples = _samples.setdefault(model_name, deque(maxlen=WINDOW_SIZE))
+        samples.append((time.monotonic(), seconds, ok))
+
+
+def _percentile(values, fraction):
+    # Nearest-rank percentile of a sorted list
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def model_stats(model_name):
+    """
+    Returns the rolling health of a model.
+
+    Returns:
+        dict: {"samples", "error_rate", "p50", "p95", "degraded"}; latencies are
+            in seconds over successful calls, None without any
+    """
+    cutoff = time.monotonic() - WINDOW_SECONDS
+    with _lock:
+        samples = [sample for sample in _samples.get(model_name, ()) if sample[0] >= cutoff]
+    latencies = sorted(seconds for _, seconds, ok in samples if ok)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    error_rate = errors / len(samples) if samples else 0.0
+    p50 = _percentile(latencies, 0.5) if latencies else None
+    p95 = _percentile(latencies, 0.95) if latencies else None
+    degraded = len(samples) >= MIN_SAMPLES and (error_rate > MAX_ERROR_RATE or (p95 or 0) > MAX_P95_SECONDS)
+    return {"samples": len(samples), "error_rate": round(error_rate, 3), "p50": p50, "p95": p95,
+            "degraded": degraded}
+
+
+def router_stats():
+    """Returns model_stats for every model that has been called."""
+    with _lock:
+        models = list(_samples)
+    return {model: model_stats(model) for model in models}
+
+
+def candidates(choice, num_questions):
+    """
+    Orders the models a quiz request should try.
+
+    An explicit model choice is respected as is. In auto mode small quizzes
+    prefer the small model and larger ones the large model; healthy models
+    come before degraded ones, and the alternatives are ordered by their
+    recent median latency, so a failing or stalled model is skipped.
+
+    Args:
+        choice: Groq model name, or AUTO
+        num_questions: Questions requested
+
+    Returns:
+        list: Model names, best first
+    """
+    if choice != AUTO:
+        return [choice]
+    preferred = SMALL_QUIZ_MODEL if num_questions <= SMALL_QUIZ_QUESTIONS else LARGE_QUIZ_MODEL
+    stats = {model: model_stats(model) for model in MODEL_CONTEXT}
+
+    def rank(model):
+        health = stats[model]
+        p50 = health["p50"]
+        # Among the alternatives, models without recent calls come after measured ones
+        return (health["degraded"], model != preferred, p50 is None, p50 or 0.0)
+
+    return sorted(MODEL_CONTEXT, key=rank)
+
+
+def route(choice, num_questions):
+    """Returns the model a quiz request should go to first (see candidates)."""
+    return candidates(choice, num_questions)[0]
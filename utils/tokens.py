@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+
+# Rough average for English prose with the Llama/Mixtral tokenizers
+CHARS_PER_TOKEN = 4
+
+# UI label -> Groq model name ('auto' is resolved per request by utils.router)
+MODELS = {
+    "Auto (fastest available)": "auto",
+    "Llama 3 70B (Recommended)": "llama3-70b-8192",
+    "Mixtral 8x7B": "mixtral-8x7b-32768",
+    "Llama 3 8B": "llama3-8b-8192"
+}
+
+# Context window (input + output tokens) of each model
+MODEL_CONTEXT = {
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+    "llama3-8b-8192": 8192,
+}
+DEFAULT_CONTEXT = 8192
+
+# Estimates are character based, so keep this much of the window spare
+SAFETY_MARGIN = 0.1
+
+# Typical completion size of one generated question, and of an inline explanation
+OUTPUT_TOKENS_PER_QUESTION = {
+    "MCQ": 70,
+    "True/False": 30,
+    "Fill-in-the-Blank": 35,
+}
+EXPLANATION_TOKENS = 35
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a piece of text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_output_tokens(quiz_type, num_questions, with_explanations=False):
+    """Estimates the completion tokens of a generated quiz."""
+    per_question = OUTPUT_TOKENS_PER_QUESTION.get(quiz_type, 70)
+    if with_explanations:
+        per_question += EXPLANATION_TOKENS
+    return per_question * num_questions
+
+
+def context_window(model_name):
+    """Returns the context window of a model, in tokens."""
+    return MODEL_CONTEXT.get(model_name, DEFAULT_CONTEXT)
+
+
+def max_input_tokens(model_name, output_tokens):
+    """Returns how many prompt tokens fit next to output_tokens in a model's context."""
+    return int(context_window(model_name) / (1 + SAFETY_MARGIN)) - output_tokens
+
+
+@dataclass
+class TokenPlan:
+    """
+    Pre-flight decision for one LLM request.
+
+    action is 'fit' (the requested model fits), 'switch' (model was replaced by
+    one with a larger context) or 'chunk' (no model fits; trim or split the input).
+    """
+    model: str
+    input_tokens: int
+    output_tokens: int
+    context: int
+    action: str
+
+    def describe(self):
+        return (f"{self.model}: ~{self.input_tokens} input + ~{self.output_tokens} output tokens "
+                f"of {self.context} ({self.action})")
+
+
+def plan_request(model_name, input_tokens, output_tokens):
+    """
+    Checks an estimated request against the model's context window.
+
+    If it does not fit, the smallest-context model that does fit is chosen
+    instead; if none fits, the plan asks the caller to trim or chunk.
+
+    Args:
+        model_name: Requested Groq model
+        input_tokens: Estimated prompt tokens
+        output_tokens: Estimated completion tokens
+
+    Returns:
+        TokenPlan: Model to use and what was decided
+    """
+    if input_tokens <= max_input_tokens(model_name, output_tokens):
+        return TokenPlan(model_name, input_tokens, output_tokens, context_window(model_name), "fit")
+    larger = sorted((context, name) for name, context in MODEL_CONTEXT.items()
+                    if input_tokens <= max_input_tokens(name, output_tokens))
+    if larger:
+        context, name = larger[0]
+        return TokenPlan(name, input_tokens, output_tokens, context, "switch")
+    return TokenPlan(model_name, input_tokens, output_tokens, context_window(model_name), "chunk")
+
+
+def trim_to_tokens(text, max_tokens):
+    """
+    Cuts text down to roughly max_tokens, at a paragraph break where one is close.
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+
+    Returns:
+        str: The text, unchanged if it already fits
+    """
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    paragraph_end = cut.rfind("\n\n")
+    if paragraph_end > max_chars // 2:
+        cut = cut[:paragraph_end]
+    return cut.rstrip()